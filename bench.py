@@ -0,0 +1,420 @@
+"""
+Benchmark suite for engine throughput regressions.
+
+	python bench.py search [--depth N] [--variant V] [--json]
+	python bench.py perft [--depth N] [--variant V] [--divide] [--json]
+	python bench.py tactics [--time T] [--variant V] [--json] [--extract PGN]
+	python bench.py eval [--calls N] [--variant V] [--json]
+
+search runs a fixed-depth search on a fixed set of positions per variant
+with a cleared transposition table, so node counts are deterministic and
+any change in them means the search itself changed. perft counts leaf
+nodes of the legal move tree and measures move generation cost.
+tactics measures time-to-solution: how long a timed search takes to
+find a forced win with the best move on the positions in TACTICS.
+eval times the standalone evaluator of each variant (EVALUATORS) per call,
+next to evaluation.evaluate on the same board.
+
+With --json every position is one JSON line, followed by a total line,
+so two runs can be diffed between commits.
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+import chess
+import chess.pgn
+
+from engine import Searcher, VARIANTS, MATE_BOUND
+from evaluation.evaluation import atomic_evaluate, evaluate
+from evaluation.antichess_eval import antichess_evaluate
+from evaluation.threecheck_eval import threecheck_eval
+
+POSITIONS = {
+	"standard": [
+		"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+		"r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+		"r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+		"r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 b - - 3 10",
+		"8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+	],
+	"atomic": [
+		"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+		"rnbqkb1r/pppppppp/5n2/8/8/5N2/PPPPPPPP/RNBQKB1R w KQkq - 2 2",
+		"r1bqkb1r/pppp1ppp/2n2n2/4p3/4P3/2N2N2/PPPP1PPP/R1BQKB1R w KQkq - 4 4",
+		"4k3/8/8/3q4/8/8/3Q4/4K3 w - - 0 1",
+	],
+	"antichess": [
+		"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1",
+		"rnbqkbnr/pppp1ppp/8/4p3/8/4P3/PPPP1PPP/RNBQKBNR w - - 0 2",
+		"rnbqkbnr/p1pppppp/8/1p6/8/1P6/P1PPPPPP/RNBQKBNR w - - 0 2",
+		"8/8/8/3k4/8/8/4P3/R7 w - - 0 1",
+	],
+	"threeCheck": [
+		"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 3+3 0 1",
+		"r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3+3 3 3",
+		"rnb1kbnr/pppp1ppp/8/4p3/4P2q/8/PPPP1PPP/RNBQKBNR w KQkq - 2+3 0 3",
+		"r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2N2N2/PPPP1PPP/R1BQK2R w KQkq - 1+2 6 5",
+	],
+}
+
+# EPD files with bm (best moves) and id, by variant
+TACTICS = {
+	"threeCheck": "tactics/threecheck.epd",
+}
+
+# Evaluator of each variant as a function of the board, white's point of view
+EVALUATORS = {
+	"standard": evaluate,
+	"atomic": lambda board: atomic_evaluate(board, 1),
+	"antichess": antichess_evaluate,
+	"threeCheck": threecheck_eval,
+}
+
+DEFAULT_SEARCH_DEPTH = 4
+DEFAULT_EVAL_CALLS = 2000
+DEFAULT_PERFT_DEPTH = 3
+DEFAULT_TACTICS_TIME = 5.0  # Seconds per position, also the time of an unsolved one
+TACTICS_PER_LENGTH = 15  # Positions per number of checks to win kept by --extract
+
+# Cleared before every position, so results don't depend on the order
+searcher = Searcher()
+
+
+def bench_search(variant, fen, depth):
+	"""Fixed-depth search of one position with a cleared table."""
+	board = VARIANTS[variant].board(fen)
+	color = 1 if board.turn == chess.WHITE else -1
+	searcher.new_game(variant)
+
+	start = time.time()
+	time_to_depth = []
+
+	def on_iteration(d, move, score):
+		time_to_depth.append(round(time.time() - start, 4))
+
+	with contextlib.redirect_stdout(io.StringIO()):
+		move = searcher.search(board, color, depth, on_iteration=on_iteration)
+	elapsed = time.time() - start
+
+	nodes = searcher.poscount + searcher.qnodes
+	return {
+		"mode": "search",
+		"variant": variant,
+		"fen": fen,
+		"depth": depth,
+		"move": str(move),
+		"nodes": searcher.poscount,
+		"qnodes": searcher.qnodes,
+		"tt_hits": searcher.tt_hits,
+		"tt_hit_rate": round(searcher.tt_hits / searcher.tt_probes, 4) if searcher.tt_probes else 0.0,
+		"eval_hits": searcher.eval_hits,
+		"eval_hit_rate": round(searcher.eval_hits / searcher.eval_probes, 4) if searcher.eval_probes else 0.0,
+		"pawn_hit_rate": round(searcher.pawn_table.hits / searcher.pawn_table.probes, 4) if searcher.pawn_table.probes else 0.0,
+		"time": round(elapsed, 4),
+		"nps": int(nodes / elapsed) if elapsed > 0 else 0,
+		"time_to_depth": time_to_depth,
+	}
+
+
+def perft(board, depth):
+	"""Number of leaf nodes of the legal move tree at depth."""
+	if depth == 0:
+		return 1
+	if board.is_variant_end():
+		return 0
+	if depth == 1:
+		return board.legal_moves.count()
+	count = 0
+	for move in board.generate_legal_moves():
+		board.push(move)
+		count += perft(board, depth - 1)
+		board.pop()
+	return count
+
+
+def bench_perft(variant, fen, depth, divide=False):
+	"""perft of one position, optionally split by root move."""
+	board = VARIANTS[variant].board(fen)
+	start = time.time()
+	split = {}
+	for move in board.generate_legal_moves():
+		board.push(move)
+		split[move.uci()] = perft(board, depth - 1)
+		board.pop()
+	elapsed = time.time() - start
+
+	nodes = sum(split.values())
+	result = {
+		"mode": "perft",
+		"variant": variant,
+		"fen": fen,
+		"depth": depth,
+		"nodes": nodes,
+		"time": round(elapsed, 4),
+		"nps": int(nodes / elapsed) if elapsed > 0 else 0,
+	}
+	if divide:
+		result["divide"] = split
+	return result
+
+
+def bench_eval(variant, fen, calls):
+	"""Time per call of the evaluator of variant and of evaluation.evaluate."""
+	board = VARIANTS[variant].board(fen)
+	evaluator = EVALUATORS[variant]
+
+	start = time.time()
+	for _ in range(calls):
+		evaluator(board)
+	elapsed = time.time() - start
+
+	start = time.time()
+	for _ in range(calls):
+		evaluate(board)
+	reference = time.time() - start
+
+	return {
+		"mode": "eval",
+		"variant": variant,
+		"fen": fen,
+		"calls": calls,
+		"score": evaluator(board),
+		"time": round(elapsed, 4),
+		"us_per_call": round(elapsed / calls * 1e6, 2),
+		"evaluate_us_per_call": round(reference / calls * 1e6, 2),
+		"relative": round(elapsed / reference, 3) if reference > 0 else 0.0,
+	}
+
+
+def load_tactics(variant):
+	"""(board, best moves, id) of every position in the TACTICS file of variant."""
+	if variant not in TACTICS:
+		return []
+	tactics = []
+	with open(TACTICS[variant]) as f:
+		for line in f:
+			if line.strip():
+				board, ops = VARIANTS[variant].board.from_epd(line)
+				tactics.append((board, ops["bm"], ops.get("id", "")))
+	return tactics
+
+
+def bench_tactic(variant, board, best_moves, position_id, time_limit):
+	"""
+	Timed search of one tactic, solved once a depth finds a forced win with
+	a best move. Time and nodes (nodes + qnodes) to solution are reported.
+	"""
+	color = 1 if board.turn == chess.WHITE else -1
+	searcher.new_game(variant)
+
+	start = time.time()
+	solved = []
+
+	def on_iteration(d, move, score):
+		if not solved and move in best_moves and score >= MATE_BOUND:
+			solved.append((round(time.time() - start, 4), d, searcher.poscount + searcher.qnodes))
+
+	with contextlib.redirect_stdout(io.StringIO()):
+		move = searcher.search_with_time(board, color, time_limit, on_iteration=on_iteration)
+
+	return {
+		"mode": "tactics",
+		"variant": variant,
+		"fen": board.epd(),
+		"id": position_id,
+		"move": str(move),
+		"solved": bool(solved),
+		"time": solved[0][0] if solved else time_limit,
+		"depth": solved[0][1] if solved else None,
+		"nodes_to_solution": solved[0][2] if solved else None,
+		"nodes": searcher.poscount,
+		"qnodes": searcher.qnodes,
+	}
+
+
+def forced_check_win(board, checks):
+	"""
+	First moves that win a three-check game by force with at most checks
+	checking moves, the defender may answer anything.
+	"""
+	wins = []
+	for move in list(board.legal_moves):
+		if not board.gives_check(move):
+			continue
+		board.push(move)
+		won = board.is_variant_loss() or board.is_checkmate()
+		if not won and checks > 1 and not board.is_variant_end():
+			won = True
+			for reply in list(board.legal_moves):
+				board.push(reply)
+				won = not board.is_variant_end() and bool(forced_check_win(board, checks - 1))
+				board.pop()
+				if not won:
+					break
+		board.pop()
+		if won:
+			wins.append(move)
+	return wins
+
+
+def extract_tactics(pgn_path, out_path):
+	"""
+	Three-check tactics from the games in pgn_path won by three checks:
+	the earliest position of the last 7 plies where the winner had a forced
+	win by checks, if it takes at least 2 checks. Written as EPD to out_path.
+	"""
+	per_length = {}
+	lines = []
+	with open(pgn_path) as pgn:
+		while True:
+			game = chess.pgn.read_game(pgn)
+			if game is None:
+				break
+			moves = list(game.mainline_moves())
+			board = game.board()
+			for move in moves:
+				board.push(move)
+			if not board.is_variant_loss() and not board.is_checkmate():
+				continue
+			winner = not board.turn
+
+			for plies in (7, 5, 3):
+				if plies > len(moves):
+					continue
+				position = game.board()
+				for move in moves[:-plies]:
+					position.push(move)
+				if position.turn != winner:
+					continue
+				for checks in range(1, (plies + 1) // 2 + 1):
+					wins = forced_check_win(position, checks)
+					if wins:
+						break
+				if wins:
+					break
+			else:
+				continue
+
+			if checks >= 2 and per_length.get(checks, 0) < TACTICS_PER_LENGTH:
+				per_length[checks] = per_length.get(checks, 0) + 1
+				lines.append(position.epd(bm=wins, id=game.headers.get("Site", "?"),
+										  c0=f"three-check in {checks}"))
+
+	with open(out_path, "w") as f:
+		f.write("\n".join(lines) + "\n")
+	return len(lines)
+
+
+def print_result(result, as_json):
+	if as_json:
+		print(json.dumps(result, sort_keys=True))
+	elif result["mode"] == "tactics":
+		solved = f"solved d{result['depth']:<2}" if result["solved"] else "unsolved  "
+		print(f"{result['variant']:<10} {solved} {result['move']:<6} time: {result['time']:.2f}s "
+			  f"nodes to solution: {result['nodes_to_solution'] or '-':>8} "
+			  f"nodes: {result['nodes']:>8} qnodes: {result['qnodes']:>8}  {result['id']}")
+	elif result["mode"] == "eval":
+		print(f"{result['variant']:<10} {result['us_per_call']:>8.1f} us/call, evaluate: "
+			  f"{result['evaluate_us_per_call']:>6.1f} us/call ({result['relative']:.2f}x) "
+			  f"score: {result['score']:>8}  {result['fen']}")
+	elif result["mode"] == "search":
+		print(f"{result['variant']:<10} d{result['depth']} {result['move']:<6} nodes: {result['nodes']:>8} "
+			  f"qnodes: {result['qnodes']:>8} tt_hit_rate: {result['tt_hit_rate']:.3f} "
+			  f"eval_hit_rate: {result['eval_hit_rate']:.3f} pawn_hit_rate: {result['pawn_hit_rate']:.3f} "
+			  f"time: {result['time']:.2f}s nps: {result['nps']:>6}  {result['fen']}")
+	else:
+		print(f"{result['variant']:<10} perft({result['depth']}) = {result['nodes']:>9} "
+			  f"time: {result['time']:.2f}s nps: {result['nps']:>7}  {result['fen']}")
+		for move, count in sorted(result.get("divide", {}).items()):
+			print(f"    {move}: {count}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Bottios benchmarks")
+	parser.add_argument("mode", choices=["search", "perft", "tactics", "eval"], nargs="?", default="search")
+	parser.add_argument("--depth", type=int, default=None)
+	parser.add_argument("--time", type=float, default=DEFAULT_TACTICS_TIME, help="tactics: seconds per position")
+	parser.add_argument("--extract", metavar="PGN",
+						help="tactics: rebuild the three-check set from the games in PGN first")
+	parser.add_argument("--variant", choices=sorted(POSITIONS), action="append",
+						help="variant to run (repeatable, default: all)")
+	parser.add_argument("--calls", type=int, default=DEFAULT_EVAL_CALLS, help="eval: calls per position")
+	parser.add_argument("--divide", action="store_true", help="perft: node count per root move")
+	parser.add_argument("--json", action="store_true", help="one JSON object per line")
+	args = parser.parse_args()
+
+	if args.extract:
+		count = extract_tactics(args.extract, TACTICS["threeCheck"])
+		print(f"{count} tactics written to {TACTICS['threeCheck']}")
+
+	variants = args.variant or list(POSITIONS)
+	totals = {"mode": args.mode, "total": True, "nodes": 0, "time": 0.0}
+	if args.mode in ("search", "tactics"):
+		totals["qnodes"] = 0
+	if args.mode == "tactics":
+		totals["solved"] = 0
+		totals["positions"] = 0
+		totals["nodes_to_solution"] = 0
+		for variant in variants:
+			for board, best_moves, position_id in load_tactics(variant):
+				result = bench_tactic(variant, board, best_moves, position_id, args.time)
+				totals["solved"] += result["solved"]
+				totals["nodes_to_solution"] += result["nodes_to_solution"] or 0
+				totals["positions"] += 1
+				totals["nodes"] += result["nodes"]
+				totals["qnodes"] += result["qnodes"]
+				totals["time"] += result["time"]
+				print_result(result, args.json)
+		totals["time"] = round(totals["time"], 4)
+		if args.json:
+			print(json.dumps(totals, sort_keys=True))
+		else:
+			print(f"solved: {totals['solved']}/{totals['positions']}, time to solution: {totals['time']:.2f}s, "
+				  f"nodes to solution: {totals['nodes_to_solution']}, nodes: {totals['nodes']}, qnodes: {totals['qnodes']}")
+		return
+
+	if args.mode == "eval":
+		reference = 0.0
+		for variant in variants:
+			for fen in POSITIONS[variant]:
+				result = bench_eval(variant, fen, args.calls)
+				totals["nodes"] += result["calls"]
+				totals["time"] += result["time"]
+				reference += result["evaluate_us_per_call"] * result["calls"] / 1e6
+				print_result(result, args.json)
+		totals["calls"] = totals.pop("nodes")
+		totals["time"] = round(totals["time"], 4)
+		totals["relative"] = round(totals["time"] / reference, 3) if reference > 0 else 0.0
+		if args.json:
+			print(json.dumps(totals, sort_keys=True))
+		else:
+			print(f"total calls: {totals['calls']}, time: {totals['time']:.2f}s, "
+				  f"{totals['relative']:.2f}x the time of evaluate")
+		return
+
+	for variant in variants:
+		for fen in POSITIONS[variant]:
+			if args.mode == "search":
+				result = bench_search(variant, fen, args.depth or DEFAULT_SEARCH_DEPTH)
+				totals["qnodes"] += result["qnodes"]
+			else:
+				result = bench_perft(variant, fen, args.depth or DEFAULT_PERFT_DEPTH, args.divide)
+			totals["nodes"] += result["nodes"]
+			totals["time"] += result["time"]
+			print_result(result, args.json)
+
+	all_nodes = totals["nodes"] + totals.get("qnodes", 0)
+	totals["time"] = round(totals["time"], 4)
+	totals["nps"] = int(all_nodes / totals["time"]) if totals["time"] > 0 else 0
+	if args.json:
+		print(json.dumps(totals, sort_keys=True))
+	else:
+		qnodes = f"qnodes: {totals['qnodes']}, " if "qnodes" in totals else ""
+		print(f"total nodes: {totals['nodes']}, {qnodes}time: {totals['time']:.2f}s, nps: {totals['nps']}")
+
+
+if __name__ == "__main__":
+	main()
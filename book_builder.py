@@ -0,0 +1,310 @@
+"""
+Build binary opening books (see opening_book.py) from PGN files.
+
+	python book_builder.py OUT.bin PGN [PGN ...] [--variant V] [--plies N]
+		[--min-games N] [--player NAME] [--color white|black] [--processes N]
+
+The PGN files are streamed, never loaded whole. Each is split by byte
+offsets into chunks that start at an [Event tag, and a process pool
+counts the chunks. A chunk yields, per (position, move), the games that
+played the move and how they ended for the side that played it.
+
+Memory stays bounded whatever the size of the PGN files. A worker's table
+only holds the moves of one chunk. The parent spills each chunk's counts
+to temporary shard files, split by key range, and never holds more than
+one shard: about SHARD_BYTES of PGN. Each shard is merged exactly on its
+own, so every count is exact. --min-games applies per move. If more than
+--max-entries moves are left, the least played ones are left out, based
+on a histogram of the game counts of all shards. The shards are in key
+order, so the book is written one shard at a time.
+
+Entries are written with weight = games, and learn = wins << 16 | draws
+of the side that played the move (capped at 0xFFFF each).
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from collections import Counter
+
+import chess
+import chess.pgn
+
+import zobrist
+from engine import VARIANTS
+from opening_book import encode_book_move, book_order, pack_entries
+
+DEFAULT_PLIES = 40  # Moves deeper into the game than this are left out
+DEFAULT_MIN_GAMES = 1
+DEFAULT_MAX_ENTRIES = 2000000  # Moves per book, see prune_threshold
+CHUNK_SIZE = 4 << 20  # Bytes of PGN per pool task
+SHARD_BYTES = 64 << 20  # Bytes of PGN per shard, sets the memory of the merge
+SPILL = struct.Struct('>QHIII')  # key, move, games, wins, draws in a shard file
+
+EVENT_TAG = b'[Event '
+RESULTS = {'1-0': chess.WHITE, '0-1': chess.BLACK, '1/2-1/2': None}
+
+
+class BookVisitor(chess.pgn.BaseVisitor):
+	"""
+	Adds the mainline moves of a game to counts.
+
+	counts[(key, encoded move)] = [games, wins, draws], results seen from
+	the side that played the move. Variations, comments and games with an
+	unknown result are skipped.
+	"""
+
+	def __init__(self, counts, plies, board_class=None, player=None, color=None):
+		self.counts = counts
+		self.plies = plies
+		self.board_class = board_class
+		self.player = player.lower() if player else None
+		self.color = color
+
+	def begin_game(self):
+		self.headers = {}
+		self.ply = 0
+		self.skip = False
+		self.counted = False  # Headers accepted and board of the variant
+		self.moves = []  # (key, encoded move, color) of this game
+
+	def visit_header(self, tagname, tagvalue):
+		self.headers[tagname] = tagvalue
+
+	def end_headers(self):
+		if self.headers.get('Result') not in RESULTS:
+			return chess.pgn.SKIP
+		if self.player:
+			colors = [color for color, tag in ((chess.WHITE, 'White'), (chess.BLACK, 'Black'))
+					  if self.headers.get(tag, '').lower() == self.player]
+			if self.color is not None:
+				colors = [color for color in colors if color == self.color]
+			if not colors:
+				return chess.pgn.SKIP
+			self.player_color = colors[0]
+		return None
+
+	def visit_board(self, board):
+		self.counted = not self.board_class or type(board) is self.board_class
+		self.skip = not self.counted
+
+	def begin_variation(self):
+		return chess.pgn.SKIP
+
+	def visit_move(self, board, move):
+		if self.skip or self.ply >= self.plies:
+			return
+		self.ply += 1
+		if self.player and board.turn != self.player_color:
+			return
+		raw = encode_book_move(board, move)
+		if raw is None:
+			self.skip = True
+			return
+		self.moves.append((zobrist.hash_board(board), raw, board.turn))
+
+	def handle_error(self, error):
+		# Illegal or unreadable move: keep the moves before it
+		self.skip = True
+
+	def result(self):
+		if not self.counted:
+			return 0
+		winner = RESULTS[self.headers['Result']]
+		for key, raw, color in self.moves:
+			entry = self.counts.get((key, raw))
+			if entry is None:
+				entry = self.counts[(key, raw)] = [0, 0, 0]
+			entry[0] += 1
+			if winner is None:
+				entry[2] += 1
+			elif winner == color:
+				entry[1] += 1
+		return 1
+
+
+def prune_threshold(histogram, max_entries):
+	"""
+	Smallest number of games t such that at most max_entries moves were
+	played in more than t games (0 if nothing has to be left out).
+
+	Args:
+		histogram: histogram[games] = number of moves played in that many games
+	"""
+	threshold = 0
+	entries = sum(histogram.values())
+	while entries > max_entries:
+		threshold += 1
+		entries -= histogram.get(threshold, 0)
+	return threshold
+
+
+def spill_counts(counts, shard_files):
+	"""Append counts to the shard files, shard i holding the i-th range of keys."""
+	shards = len(shard_files)
+	records = [[] for _ in range(shards)]
+	for (key, raw), (games, wins, draws) in counts.items():
+		records[key * shards >> 64].append(SPILL.pack(key, raw, games, wins, draws))
+	for f, shard_records in zip(shard_files, records):
+		f.write(b''.join(shard_records))
+
+
+def read_spill(f):
+	"""(key, encoded move, games, wins, draws) records of a shard file, from the start."""
+	f.seek(0)
+	data = f.read()
+	return SPILL.iter_unpack(data) if data else ()
+
+
+def merge_shard(f, min_games):
+	"""
+	Exact counts of a shard file, rewritten in book order and without the
+	moves of fewer than min_games games.
+
+	Returns:
+		Histogram of the game counts left
+	"""
+	counts = {}
+	for key, raw, games, wins, draws in read_spill(f):
+		entry = counts.get((key, raw))
+		if entry is None:
+			counts[(key, raw)] = [games, wins, draws]
+		else:
+			entry[0] += games
+			entry[1] += wins
+			entry[2] += draws
+	entries = sorted(((key, raw, games, wins, draws) for (key, raw), (games, wins, draws) in counts.items()
+					  if games >= min_games), key=book_order)
+	f.seek(0)
+	f.truncate()
+	f.write(b''.join(SPILL.pack(*entry) for entry in entries))
+	return Counter(entry[2] for entry in entries)
+
+
+def split_pgn(path, chunk_size=CHUNK_SIZE):
+	"""(start, end) byte ranges of path, a game belongs to the range its [Event tag starts in."""
+	size = os.path.getsize(path)
+	return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+
+def read_chunk(path, start, end):
+	"""Text of each game whose [Event tag starts in [start, end)."""
+	with open(path, 'rb') as f:
+		f.seek(start)
+		offset = start
+		lines = None
+		for line in f:
+			if line.startswith(EVENT_TAG):
+				if lines:
+					yield b''.join(lines).decode('utf-8', 'replace')
+				if offset >= end:
+					return
+				lines = [line]
+			elif lines is not None:
+				lines.append(line)
+			offset += len(line)
+		if lines:
+			yield b''.join(lines).decode('utf-8', 'replace')
+
+
+def count_chunk(task):
+	"""Pool task: counts of one chunk, see BookVisitor."""
+	path, start, end, options = task
+	counts = {}
+	visitor = BookVisitor(counts, options['plies'], options['board_class'],
+						  options['player'], options['color'])
+	games = 0
+	for text in read_chunk(path, start, end):
+		games += chess.pgn.read_game(io.StringIO(text), Visitor=lambda: visitor) or 0
+	return games, counts
+
+
+def build_book(pgn_paths, out_path, variant=None, plies=DEFAULT_PLIES, min_games=DEFAULT_MIN_GAMES,
+			   player=None, color=None, processes=None, max_entries=DEFAULT_MAX_ENTRIES, shards=None,
+			   chunk_size=CHUNK_SIZE):
+	"""
+	Count the games of pgn_paths in a process pool and write the book.
+
+	Args:
+		variant: only games of this variant (key of engine.VARIANTS), default all
+		plies: only the first plies of every game
+		min_games: leave out moves played in fewer games
+		player: only games of this player, and only the player's moves
+		color: with player, only games where the player had this color
+		max_entries: leave out the least played moves beyond this many
+		shards: number of key ranges merged one at a time, default one per
+		        SHARD_BYTES of PGN
+		chunk_size: bytes of PGN per pool task
+
+	Returns:
+		(games counted, entries written)
+	"""
+	options = {
+		'plies': plies,
+		'board_class': VARIANTS[variant].board if variant else None,
+		'player': player,
+		'color': color,
+	}
+	tasks = [(path, start, end, options) for path in pgn_paths for start, end in split_pgn(path, chunk_size)]
+	if shards is None:
+		shards = 1 + sum(os.path.getsize(path) for path in pgn_paths) // SHARD_BYTES
+
+	games = 0
+	entries = 0
+	with tempfile.TemporaryDirectory() as spill_dir:
+		shard_files = [open(os.path.join(spill_dir, '%d.bin' % index), 'w+b') for index in range(shards)]
+		try:
+			with multiprocessing.Pool(processes) as pool:
+				for chunk_games, chunk_counts in pool.imap_unordered(count_chunk, tasks):
+					games += chunk_games
+					spill_counts(chunk_counts, shard_files)
+
+			histogram = Counter()
+			for f in shard_files:
+				histogram.update(merge_shard(f, min_games))
+			# Only once all games are counted: a move dropped earlier would lose
+			# the games it was already seen in
+			threshold = prune_threshold(histogram, max_entries)
+
+			tmp_path = '%s.%d.tmp' % (out_path, os.getpid())
+			with open(tmp_path, 'wb') as out:
+				for f in shard_files:
+					shard_entries = [(key, raw, games_played, min(wins, 0xFFFF) << 16 | min(draws, 0xFFFF))
+									 for key, raw, games_played, wins, draws in read_spill(f)
+									 if games_played > threshold]
+					out.write(pack_entries(shard_entries))
+					entries += len(shard_entries)
+			os.replace(tmp_path, out_path)
+		finally:
+			for f in shard_files:
+				f.close()
+	return games, entries
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Build a binary opening book from PGN files")
+	parser.add_argument("out", help="book to write, e.g. books/threecheck_white.bin")
+	parser.add_argument("pgn", nargs="+", help="PGN files")
+	parser.add_argument("--variant", choices=sorted(VARIANTS), help="only games of this variant")
+	parser.add_argument("--plies", type=int, default=DEFAULT_PLIES, help="plies per game to add")
+	parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES,
+						help="leave out moves played in fewer games")
+	parser.add_argument("--player", help="only games and moves of this player")
+	parser.add_argument("--color", choices=["white", "black"], help="with --player: only games with this color")
+	parser.add_argument("--processes", type=int, default=None, help="pool size (default: CPU count)")
+	parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+						help="most moves in the book, the least played are left out")
+	args = parser.parse_args()
+
+	color = None if args.color is None else args.color == "white"
+	start = time.time()
+	games, entries = build_book(args.pgn, args.out, args.variant, args.plies, args.min_games,
+								args.player, color, args.processes, args.max_entries)
+	print(f"{games} games, {entries} entries written to {args.out} in {time.time() - start:.2f}s")
+
+
+if __name__ == "__main__":
+	main()
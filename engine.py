@@ -1,235 +1,239 @@
 import chess
 import chess.polyglot
 import time
-from evaluation.evaluation import *
-from evaluation.antichess_eval import antichess_evaluate
+from evaluation.evaluation import atomic_king_safety, material_pst
 from evaluation.threecheck_eval import threecheck_eval
-from opening_book import Book
-import pickle
+from evaluation.antichess_eval import antichess_evaluate
+from evaluation.piece_square_tables import PSQT
+from evaluation.pawns import PawnHashTable
+from transposition import TranspositionTable, EXACT, LOWERBOUND, UPPERBOUND
+from see import see, atomic_see, SEE_VALUES
+from pns import ProofNumberSearch
+import zobrist
+import argparse
+import itertools
 import random
-import pprint
 import chess.variant
 
-inf = float('inf')
-poscount = 0
-qnodes = 0  # Quiescence nodes
-tt_hits = 0
+# Scores are from the side to move's point of view. Evaluations stay far
+# below MATE_BOUND (a king is worth 10^6), a mate in n plies scores
+# MATE_SCORE - n, getting mated in n plies -MATE_SCORE + n.
+MATE_SCORE = 10 ** 7
+MAX_PLY = 256
+MATE_BOUND = MATE_SCORE - MAX_PLY  # abs(score) >= MATE_BOUND is a mate score
+INFINITE = MATE_SCORE + 1  # Search window bound, beyond every score
 
 DEPTH = 2
 MAX_QUIESCE_DEPTH = 10  # Limit quiescence search depth
+DELTA_MARGIN = 200  # Delta pruning: captures that can't get within this of alpha are skipped
 MAX_KILLER_PLY = 64  # Maximum ply for killer moves
 
-# Transposition table entry types
-EXACT = 0      # Exact score
-LOWERBOUND = 1 # Score is at least this (beta cutoff)
-UPPERBOUND = 2 # Score is at most this (failed to raise alpha)
-
-# Transposition table: zobrist_hash -> (depth, score, flag, best_move)
-transposition_table = {}
-TT_SIZE = 1000000  # Max entries
-
-# Killer moves: store 2 killer moves per ply
-# killer_moves[ply] = [move1, move2]
-killer_moves = [[None, None] for _ in range(MAX_KILLER_PLY)]
-
-# Piece values for MVV-LVA move ordering
-PIECE_VALUES = {
-	chess.PAWN: 100,
-	chess.KNIGHT: 320,
-	chess.BISHOP: 330,
-	chess.ROOK: 500,
-	chess.QUEEN: 900,
-	chess.KING: 20000
+# History heuristic: scores of quiet moves that caused beta cutoffs,
+# kept in [-HISTORY_MAX, HISTORY_MAX] and halved between searches
+HISTORY_MAX = 16384
+HISTORY_BONUS_MAX = 2048  # Bonus is 32 * depth^2 up to this
+LMR_HISTORY_DIVISOR = 128  # One more ply of LMR per this much negative history
+
+# Evaluation cache: direct-mapped, one entry per slot, indexed by the low
+# bits of the position hash. Cleared when the variant changes.
+EVAL_CACHE_SIZE = 1 << 16  # Entries, must be a power of two
+
+# Forward pruning, each technique can be switched off through Searcher.pruning.
+# Only used at non-PV nodes, never in check and never in antichess, where
+# captures are forced and the static eval says little about the position.
+PRUNING = {
+	"reverse_futility": True,  # Static eval far above beta: return without searching
+	"razoring": True,  # Static eval far below alpha: verify with quiescence only
+	"futility": True,  # Skip quiet moves that can't raise the static eval to alpha
+	"late_move": True,  # Skip late quiet moves at low depth
 }
+REVERSE_FUTILITY_DEPTH = 3
+REVERSE_FUTILITY_MARGIN = 120  # Per ply of depth
+RAZOR_DEPTH = 2
+RAZOR_MARGIN = 300  # Per ply of depth
+FUTILITY_DEPTH = 2
+FUTILITY_MARGIN = 150  # Per ply of depth
+LATE_MOVE_DEPTH = 3
+LATE_MOVE_COUNTS = [0, 12, 18, 30]  # Quiet moves searched before pruning, by depth
+
+# Three-check: checks are worth as much as material, so quiescence also tries
+# quiet checks (QUIESCE_CHECKS per line) and a check is extended at any depth
+# once the checking side needs at most CHECK_EXTENSION_REMAINING more checks.
+QUIESCE_CHECKS = 1
+CHECK_EXTENSION_REMAINING = 2
+
+# Aspiration windows: from ASPIRATION_MIN_DEPTH on, a depth is first searched
+# with a window of +-ASPIRATION_WINDOW around the previous depth's score.
+# The failing side is widened (doubling) and opened fully beyond ASPIRATION_MAX.
+ASPIRATION_MIN_DEPTH = 3
+ASPIRATION_WINDOW = 40
+ASPIRATION_MAX = 1000
+
+# Transposition table: fixed-size buffer, see transposition.py
+TT_SIZE_MB = 32  # Memory per game process
+
+# Cooperative stop: the search polls the clock every NODE_CHECK_INTERVAL
+# nodes and unwinds with SearchAborted once the hard deadline or the node
+# limit has passed, or stop() was called.
+NODE_CHECK_INTERVAL = 32
+SOFT_TIME_RATIO = 0.5  # Don't start a new depth after this share of the time
+
+# Endgame solver (Variant.solver): tried before the search once at most
+# SOLVER_MAX_PIECES pieces are left, or SOLVER_MOBILITY_PIECES with at most
+# SOLVER_MAX_MOBILITY moves for the side to move. Each of its two proofs (win,
+# loss) gets SOLVER_NODES_PER_SECOND nodes per second of move time, at most
+# SOLVER_NODES, which runs out well before SOLVER_TIME_RATIO of the move time.
+# A proven win is played at once, a proven loss is only searched for
+# SOLVER_LOST_TIME seconds.
+SOLVER_MAX_PIECES = 8
+SOLVER_MOBILITY_PIECES = 12
+SOLVER_MAX_MOBILITY = 2
+SOLVER_NODES = 50000
+SOLVER_NODES_PER_SECOND = 250  # Per proof, about 3000 nodes/s are searched
+SOLVER_TIME_RATIO = 0.3
+SOLVER_LOST_TIME = 0.2
+
+class SearchAborted(Exception):
+	"""Raised inside the search when it has to stop immediately."""
+	pass
 
 def mvv_lva_score(board, move):
-	"""Most Valuable Victim - Least Valuable Attacker scoring for move ordering."""
+	"""
+	Most Valuable Victim - Least Valuable Attacker scoring for move ordering,
+	with the piece values of see.py. Only called for captures and promotions,
+	so no is_capture() test.
+	"""
 	score = 0
 
 	# Captures: prioritize capturing high-value pieces with low-value pieces
-	if board.is_capture(move):
-		victim = board.piece_at(move.to_square)
-		attacker = board.piece_at(move.from_square)
-		if victim:
-			score += 10 * PIECE_VALUES.get(victim.piece_type, 0)
-		if attacker:
-			score -= PIECE_VALUES.get(attacker.piece_type, 0)
+	victim = board.piece_type_at(move.to_square)
+	if victim:
+		score += 10 * SEE_VALUES[victim] - SEE_VALUES[board.piece_type_at(move.from_square)]
+	elif move.to_square == board.ep_square and not move.promotion:
+		# En passant: pawn takes pawn
+		score += 10 * SEE_VALUES[chess.PAWN] - SEE_VALUES[chess.PAWN]
 
 	# Promotions are valuable
 	if move.promotion:
-		score += PIECE_VALUES.get(move.promotion, 0)
+		score += SEE_VALUES[move.promotion]
 
 	return score
 
-def store_killer(move, ply):
-	"""Store a killer move at the given ply."""
-	if ply >= MAX_KILLER_PLY:
-		return
-	# Don't store if it's already the first killer
-	if killer_moves[ply][0] == move:
-		return
-	# Shift: move current first killer to second slot
-	killer_moves[ply][1] = killer_moves[ply][0]
-	killer_moves[ply][0] = move
-
-def order_moves(board, moves, pv_move=None, tt_move=None, ply=0):
-	"""Order moves for better alpha-beta pruning."""
-	killers = killer_moves[ply] if ply < MAX_KILLER_PLY else [None, None]
-
-	def move_score(move):
-		# PV move from previous iteration gets highest priority
-		if pv_move and move == pv_move:
-			return 100000
-		# TT move (from transposition table) gets second priority
-		if tt_move and move == tt_move:
-			return 90000
-		# Captures scored by MVV-LVA (will be 100-9000 range typically)
-		if board.is_capture(move):
-			return 10000 + mvv_lva_score(board, move)
-		# Killer moves get priority after captures
-		if move == killers[0]:
-			return 9000
-		if move == killers[1]:
-			return 8000
-		# Promotions are good
-		if move.promotion:
-			return 7000 + PIECE_VALUES.get(move.promotion, 0)
-		return 0
-
-	return sorted(moves, key=move_score, reverse=True)
-
-def get_static_eval(node, color, variant):
-	"""Get static evaluation for the position."""
-	if variant == "antichess":
-		return antichess_evaluate(node, color, variant) * color
-	if variant == "threeCheck":
-		return threecheck_eval(node, color, variant) * color
-	return evaluate(node, color, variant) * color
-
-def quiesce(node, a, b, color, variant, qdepth=0):
-	"""
-	Quiescence search - continue searching captures until position is quiet.
-	This avoids the horizon effect where we evaluate mid-capture.
-	"""
-	global qnodes, tt_hits, transposition_table
-
-	# TT lookup for quiescence (use negative depth to distinguish from main search)
-	pos_hash = chess.polyglot.zobrist_hash(node)
-	q_depth_key = -qdepth - 1  # -1, -2, -3... for quiescence depths
-	if pos_hash in transposition_table:
-		tt_entry = transposition_table[pos_hash]
-		tt_depth, tt_score, tt_flag, _ = tt_entry
-		# Only use TT if it was from same or deeper quiescence search
-		if tt_depth <= q_depth_key:
-			tt_hits += 1
-			if tt_flag == EXACT:
-				return tt_score
-			elif tt_flag == LOWERBOUND:
-				a = max(a, tt_score)
-			elif tt_flag == UPPERBOUND:
-				b = min(b, tt_score)
-			if a >= b:
-				return tt_score
-
-	# Check for game end
-	if node.is_checkmate():
-		return -inf
-	if node.is_stalemate() or node.can_claim_draw():
-		return 0
-	if node.is_variant_end():
-		return get_static_eval(node, color, variant)
-
-	# Stand pat: evaluate current position
-	# The side to move can choose to not capture
-	stand_pat = get_static_eval(node, color, variant)
-
-	if stand_pat >= b:
-		return b  # Beta cutoff
-	if stand_pat > a:
-		a = stand_pat
-
-	# Limit quiescence depth
-	if qdepth >= MAX_QUIESCE_DEPTH:
-		return stand_pat
-
-	# Generate and search only captures (and promotions)
-	captures = [m for m in node.legal_moves if node.is_capture(m) or m.promotion]
-
-	if not captures:
-		return stand_pat
-
-	# Order captures by MVV-LVA
-	captures = sorted(captures, key=lambda m: mvv_lva_score(node, m), reverse=True)
+def mate_distance(score):
+	"""Plies to mate of a mate score (negative if we get mated), None for other scores."""
+	if score >= MATE_BOUND:
+		return MATE_SCORE - score
+	if score <= -MATE_BOUND:
+		return -(MATE_SCORE + score)
+	return None
+
+def score_to_tt(score, ply):
+	"""Mate scores are stored as distance from the node, not from the root."""
+	if score >= MATE_BOUND:
+		return score + ply
+	if score <= -MATE_BOUND:
+		return score - ply
+	return score
 
-	alpha_orig = a
-	best_score = stand_pat
+def score_from_tt(score, ply):
+	"""Inverse of score_to_tt, for a node ply plies from the root."""
+	if score >= MATE_BOUND:
+		return score - ply
+	if score <= -MATE_BOUND:
+		return score + ply
+	return score
 
-	for move in captures:
-		qnodes += 1
-		node.push(move)
-		score = -quiesce(node, -b, -a, -color, variant, qdepth + 1)
-		node.pop()
+def variant_end_score(node, ply):
+	"""Score of a variant game over (exploded king, third check, no pieces left)."""
+	if node.is_variant_loss():
+		return -MATE_SCORE + ply
+	if node.is_variant_win():
+		return MATE_SCORE - ply
+	return 0
+
+def update_history(value, bonus):
+	"""Add bonus to a history score, saturating at +-HISTORY_MAX."""
+	return value + bonus - value * abs(bonus) // HISTORY_MAX
+
+def piece_key(board, move):
+	"""Index of (side to move, moving piece, target square), the layout of the PSQT tables."""
+	return (board.turn * 7 + board.piece_type_at(move.from_square)) * 64 + move.to_square
+
+def previous_move_key(board):
+	"""piece_key of the move that led to board, None at the root or after a null move."""
+	if not board.move_stack:
+		return None
+	move = board.move_stack[-1]
+	if not move:
+		return None
+	piece_type = board.piece_type_at(move.to_square)
+	if not piece_type:
+		return None  # Exploded (atomic)
+	return ((not board.turn) * 7 + piece_type) * 64 + move.to_square
 
-		if score > best_score:
-			best_score = score
+def pick_moves(scored):
+	"""
+	Yield moves from a list of (score, move) best first, selection-sort style,
+	so no sorting work is done for moves after a cutoff.
+	"""
+	while scored:
+		best = 0
+		for i in range(1, len(scored)):
+			if scored[i][0] > scored[best][0]:
+				best = i
+		scored[best], scored[-1] = scored[-1], scored[best]
+		yield scored.pop()[1]
+
+def losing_capture(board, move):
+	"""Does a capture lose material? SEE is only needed if the attacker is worth more than the victim."""
+	victim = board.piece_type_at(move.to_square) or chess.PAWN  # En passant
+	if SEE_VALUES[victim] >= SEE_VALUES[board.piece_type_at(move.from_square)]:
+		return False
+	return see(board, move) < 0
+
+def prune_capture(board, move, needed):
+	"""
+	Can quiescence skip this capture? Yes if it loses material (SEE < 0),
+	or if winning the captured piece for free still gains less than
+	needed - DELTA_MARGIN (delta pruning).
+	"""
+	victim = board.piece_type_at(move.to_square) or chess.PAWN  # En passant
+	return SEE_VALUES[victim] + DELTA_MARGIN <= needed or losing_capture(board, move)
 
-		if score >= b:
-			# Store in TT before returning
-			transposition_table[pos_hash] = (q_depth_key, score, LOWERBOUND, None)
-			return b  # Beta cutoff
-		if score > a:
-			a = score
-
-	# Store result in TT
-	if best_score <= alpha_orig:
-		tt_flag = UPPERBOUND
-	elif best_score >= b:
-		tt_flag = LOWERBOUND
+def promotion_pushes(board):
+	"""Legal non-capture promotions."""
+	if board.turn == chess.WHITE:
+		pawns = board.pawns & board.occupied_co[chess.WHITE] & chess.BB_RANK_7
 	else:
-		tt_flag = EXACT
-	transposition_table[pos_hash] = (q_depth_key, best_score, tt_flag, None)
-
-	return a
-
-def clear_killers():
-	"""Clear killer moves table."""
-	global killer_moves
-	for i in range(MAX_KILLER_PLY):
-		killer_moves[i] = [None, None]
-
-def search(node, color, variant, depth):
-	"""Iterative deepening search to fixed depth."""
-	global poscount, qnodes, tt_hits, transposition_table
-	poscount = 0
-	qnodes = 0
-	tt_hits = 0
-	clear_killers()
-	# Keep TT between depths for iterative deepening (don't clear it)
-
-	moves = list(node.legal_moves)
-	if not moves:
-		print('Game over.')
-		return
-
-	best_move = None
-
-	# Iterative deepening: search depth 1, then 2, ..., up to target depth
-	for current_depth in range(1, depth + 1):
-		nodes_before = poscount
-		qnodes_before = qnodes
-		hits_before = tt_hits
-		result = negamax(node, -inf, inf, color, variant, current_depth, pv_move=best_move)
-		best_move = result[1]
-		nodes_this_depth = poscount - nodes_before
-		qnodes_this_depth = qnodes - qnodes_before
-		hits_this_depth = tt_hits - hits_before
-		print(f"depth {current_depth}: {best_move} (score: {result[0]}, nodes: {nodes_this_depth}, qnodes: {qnodes_this_depth}, tt_hits: {hits_this_depth})")
-
-	print(f"total nodes: {poscount}, qnodes: {qnodes}, tt_hits: {tt_hits}, tt_size: {len(transposition_table)}")
-	if not best_move:
-		return random.choice(moves)
-	return best_move
+		pawns = board.pawns & board.occupied_co[chess.BLACK] & chess.BB_RANK_2
+	if not pawns:
+		return []
+	return list(board.generate_legal_moves(pawns, ~board.occupied))
 
+def quiet_checks(board):
+	"""
+	Legal non-captures of knights, bishops, rooks and queens that give check
+	directly (discovered checks are left out), generated from the squares
+	that attack the enemy king.
+	"""
+	king = board.king(not board.turn)
+	if king is None:
+		return []
+	ours = board.occupied_co[board.turn]
+	occupied = board.occupied
+	empty = ~occupied & chess.BB_ALL
+	diagonal = chess.BB_DIAG_ATTACKS[king][chess.BB_DIAG_MASKS[king] & occupied] & empty
+	straight = (chess.BB_RANK_ATTACKS[king][chess.BB_RANK_MASKS[king] & occupied] |
+				chess.BB_FILE_ATTACKS[king][chess.BB_FILE_MASKS[king] & occupied]) & empty
+
+	moves = []
+	for pieces, targets in ((board.knights, chess.BB_KNIGHT_ATTACKS[king] & empty),
+							(board.bishops, diagonal),
+							(board.rooks, straight),
+							(board.queens, diagonal | straight)):
+		if pieces & ours and targets:
+			moves.extend(board.generate_legal_moves(pieces & ours, targets))
+	return moves
 
 def calculate_move_time(time_remaining_ms, increment_ms=0, moves_played=0):
 	"""
@@ -284,267 +288,1027 @@ def calculate_move_time(time_remaining_ms, increment_ms=0, moves_played=0):
 	return max(min_time, min(max_time, time_with_increment))
 
 
-def search_with_time(node, color, variant, time_limit, min_depth=1, max_depth=20):
-	"""
-	Iterative deepening search with time limit.
-	Searches until time runs out, returns best move from last completed depth.
+# Variants
+#
+# Everything the search does differently per variant comes from a Variant
+# in VARIANTS, so nothing compares variant names during the search.
+# Static evals take (searcher, node, color, material) and return the score
+# from white's point of view, material being the incremental material + PST.
+# Quiescence filters take (node, moves, needed) with needed = alpha - stand pat
+# and return (score, move) pairs of the captures worth searching.
 
-	Args:
-		node: Board position
-		color: Side to move (1=white, -1=black)
-		variant: Chess variant
-		time_limit: Maximum time to search in seconds
-		min_depth: Minimum depth to search (default 1)
-		max_depth: Maximum depth to search (default 20)
+def standard_static_eval(searcher, node, color, material):
+	"""Material, PST and pawn structure."""
+	return material + searcher.pawn_score(node)
 
-	Returns:
-		Best move found
-	"""
-	global poscount, qnodes, tt_hits, transposition_table
-	poscount = 0
-	qnodes = 0
-	tt_hits = 0
-	clear_killers()
+def atomic_static_eval(searcher, node, color, material):
+	"""Standard terms and attacks next to the enemy king."""
+	return material + searcher.pawn_score(node) + atomic_king_safety(node, color)
 
-	start_time = time.time()
+def threecheck_static_eval(searcher, node, color, material):
+	"""Standard terms, the checks given so far and the checks ready to be given."""
+	return threecheck_eval(node, material, searcher.pawn_score(node))
 
-	moves = list(node.legal_moves)
-	if not moves:
-		print('Game over.')
-		return None
+def antichess_static_eval(searcher, node, color, material):
+	"""Piece count difference (the antichess PSQT) and forced captures."""
+	return antichess_evaluate(node, material)
 
-	if len(moves) == 1:
-		# Only one legal move, just play it
-		print(f"Only one legal move: {moves[0]}")
-		return moves[0]
+def see_captures(node, moves, needed):
+	"""Skip losing and delta-pruned captures, best exchange first, MVV-LVA among equal ones."""
+	return [((see(node, m), mvv_lva_score(node, m)), m) for m in moves
+			if m.promotion or not prune_capture(node, m, needed)]
 
-	best_move = None
-	best_score = -inf
-	completed_depth = 0
+def threecheck_captures(node, moves, needed):
+	"""As see_captures, but captures that give check are always searched."""
+	return [((see(node, m), mvv_lva_score(node, m)), m) for m in moves
+			if m.promotion or not prune_capture(node, m, needed) or node.gives_check(m)]
 
-	last_depth_time = 0
+def atomic_captures(node, moves, needed):
+	"""
+	The explosion is the whole exchange: skip captures that lose material
+	or can't get within DELTA_MARGIN of needed, best balance first.
+	"""
+	captures = []
+	for move in moves:
+		gain = atomic_see(node, move)
+		if move.promotion or (gain >= 0 and gain + DELTA_MARGIN > needed):
+			captures.append((gain, move))
+	return captures
 
-	for current_depth in range(1, max_depth + 1):
-		elapsed = time.time() - start_time
-		time_remaining = time_limit - elapsed
+def all_captures(node, moves, needed):
+	"""Every capture by MVV-LVA, for variants where SEE means nothing."""
+	return [(mvv_lva_score(node, m), m) for m in moves]
 
-		# Estimate time for next depth based on last depth (branching factor ~6-8x)
-		# Be conservative: assume next depth takes 8x longer
-		estimated_next_time = last_depth_time * 8 if last_depth_time > 0 else 0
+def threecheck_extend_check(node):
+	"""Extend a check if the checking side is close to winning on checks."""
+	return node.remaining_checks[not node.turn] <= CHECK_EXTENSION_REMAINING
 
-		# Don't start a new depth if:
-		# 1. We've passed minimum depth AND
-		# 2. We estimate we won't finish in time
-		if current_depth > min_depth and estimated_next_time > time_remaining:
-			print(f"Stopping: estimated {estimated_next_time:.1f}s for depth {current_depth}, only {time_remaining:.1f}s remaining")
-			break
 
-		nodes_before = poscount
-		depth_start = time.time()
+class Variant():
+	"""
+	How the engine plays one variant.
 
-		result = negamax(node, -inf, inf, color, variant, current_depth, pv_move=best_move)
+	Args:
+		name: Lichess variant key
+		board: python-chess board class
+		static_eval: static eval function, see above
+		psqt: key of the PSQT table kept incrementally (evaluation.piece_square_tables)
+		capture_order: capture_order(board, move), score of a capture for move ordering
+		quiesce_captures: quiescence filter, see above
+		quiesce_checks: quiet checks quiescence may play per line
+		extend_check: extend_check(node) for a node in check, True extends the
+		              check at any depth (checks are always extended at depth 1)
+		null_move: null move pruning allowed (unsafe where zugzwang is common)
+		forward_pruning: reverse futility, razoring, futility and late move pruning allowed
+		stalemate_wins: a side without legal moves wins instead of drawing
+		solver: endgame solver class with solve(board, winner, max_nodes, should_stop),
+		        see pns.py and SOLVER_MAX_PIECES
+		books: opening book file per color (chess.WHITE / chess.BLACK), see opening_book.py
+	"""
 
-		depth_time = time.time() - depth_start
-		last_depth_time = depth_time
-		elapsed = time.time() - start_time
+	def __init__(self, name, board, static_eval, psqt, capture_order=mvv_lva_score,
+				 quiesce_captures=see_captures, quiesce_checks=0, extend_check=None,
+				 null_move=True, forward_pruning=True, stalemate_wins=False, solver=None,
+				 books=None):
+		self.name = name
+		self.board = board
+		self.static_eval = static_eval
+		self.psqt = psqt
+		self.capture_order = capture_order
+		self.quiesce_captures = quiesce_captures
+		self.quiesce_checks = quiesce_checks
+		self.extend_check = extend_check
+		self.null_move = null_move
+		self.forward_pruning = forward_pruning
+		self.stalemate_wins = stalemate_wins
+		self.solver = solver
+		self.books = books or {}
+
+
+VARIANTS = {
+	"standard": Variant(
+		"standard", chess.Board, standard_static_eval, "standard",
+		books={chess.WHITE: "penguin.book", chess.BLACK: "penguin.book"}),
+	# Captures explode the neighbourhood, so SEE and MVV-LVA don't apply
+	"atomic": Variant(
+		"atomic", chess.variant.AtomicBoard, atomic_static_eval, "atomic",
+		capture_order=atomic_see, quiesce_captures=atomic_captures,
+		books={chess.WHITE: "atomic_white.book", chess.BLACK: "atomic_black.book"}),
+	# Captures are forced and zugzwang is everywhere: no SEE, null move or
+	# forward pruning, and running out of moves wins. Endings are solved by df-pn.
+	"antichess": Variant(
+		"antichess", chess.variant.GiveawayBoard, antichess_static_eval, "antichess",
+		quiesce_captures=all_captures, null_move=False, forward_pruning=False,
+		stalemate_wins=True, solver=ProofNumberSearch),
+	"threeCheck": Variant(
+		"threeCheck", chess.variant.ThreeCheckBoard, threecheck_static_eval, "threeCheck",
+		quiesce_captures=threecheck_captures, quiesce_checks=QUIESCE_CHECKS,
+		extend_check=threecheck_extend_check,
+		books={chess.WHITE: "threecheck_white.book", chess.BLACK: "threecheck_black.book"}),
+}
 
-		# Only update best move if we completed this depth
-		if result[1] is not None:
-			best_move = result[1]
-			best_score = result[0]
-			completed_depth = current_depth
-
-			nodes_this_depth = poscount - nodes_before
-			print(f"depth {current_depth}: {best_move} (score: {best_score:.1f}, nodes: {nodes_this_depth}, time: {depth_time:.2f}s, total: {elapsed:.2f}s)")
-
-		# Hard stop if we've exceeded time limit
-		if elapsed >= time_limit:
-			print(f"Time limit reached after depth {current_depth}")
-			break
-
-		# Check for forced mate - no need to search deeper
-		if abs(best_score) > 100000:
-			print(f"Mate found at depth {current_depth}")
-			break
-
-	total_time = time.time() - start_time
-	print(f"Search complete: depth {completed_depth}, nodes: {poscount}, qnodes: {qnodes}, time: {total_time:.2f}s")
-
-	if not best_move:
-		return random.choice(moves)
-	return best_move
-
-def negamax(node, a, b, color, variant, depth=DEPTH, ply=0, pv_move=None, null_move_allowed=True):
-	global poscount, tt_hits, transposition_table
-
-	alpha_orig = a
-
-	# Transposition table lookup
-	pos_hash = chess.polyglot.zobrist_hash(node)
-	tt_move = None
-	if pos_hash in transposition_table:
-		tt_entry = transposition_table[pos_hash]
-		tt_depth, tt_score, tt_flag, tt_move = tt_entry
-
-		if tt_depth >= depth:
-			tt_hits += 1
-			if tt_flag == EXACT:
-				return (tt_score, tt_move)
-			elif tt_flag == LOWERBOUND:
-				a = max(a, tt_score)
-			elif tt_flag == UPPERBOUND:
-				b = min(b, tt_score)
+def get_variant(name):
+	"""Variant of a Lichess variant key, standard for unknown variants."""
+	return VARIANTS.get(name, VARIANTS["standard"])
 
-			if a >= b:
-				return (tt_score, tt_move)
 
-	if node.is_checkmate():
-		return (-inf, None)
+class Searcher():
+	"""
+	All state of a search: transposition table, killer moves, counters,
+	limits and the variant being searched.
 
-	if node.is_stalemate():
-		return (0, None)
+	One Searcher per game keeps the table warm from move to move, new_game()
+	wipes it. Searchers share nothing, so several can run in one process
+	(e.g. in threads) without interfering.
+	"""
 
-	# Handle draws (threefold repetition, 50-move rule)
-	# Use contempt: if we're ahead, a draw is bad; if we're behind, a draw is good
-	if node.can_claim_draw():
+	def __init__(self, variant="standard", tt_size_mb=TT_SIZE_MB, pruning=None):
+		self.transposition_table = TranspositionTable(tt_size_mb)
+		self.set_variant(variant)
+
+		# Forward pruning switches, see PRUNING
+		self.pruning = dict(PRUNING)
+		if pruning:
+			self.pruning.update(pruning)
+
+		# Counters of the last search
+		self.poscount = 0
+		self.qnodes = 0  # Quiescence nodes
+		self.tt_hits = 0
+		self.tt_probes = 0  # TT lookups, tt_hits / tt_probes is the hit rate
+		self.eval_hits = 0
+		self.eval_probes = 0  # Static evals asked for, eval_hits / eval_probes is the hit rate
+
+		# Limits: the deadline is only set while a depth may be aborted,
+		# max_nodes (poscount + qnodes) applies to search_with_time
+		self.hard_deadline = None
+		self.max_nodes = None
+		self.stop_requested = False
+		self.nodes_until_check = NODE_CHECK_INTERVAL
+
+		# Hashes of the positions on the current search path, hash_stack[-1] is
+		# the current node. Updated incrementally by push_move/pop_move.
+		# Entries before root_index are game positions since the last irreversible
+		# move, so repetitions of the game history are found too.
+		self.hash_stack = []
+		self.root_index = 0
+		# hash_stack index of the position after the null move on the search
+		# path, if any: repetitions are never looked for across it
+		self.null_index = 0
+
+		# Pawn-only hashes along the search path (zobrist.pawn_hash),
+		# the keys of pawn_table
+		self.pawn_hash_stack = []
+		self.pawn_table = PawnHashTable()
+
+		# Material + PST score (white's point of view) along the search path,
+		# kept in step with hash_stack using the PSQT table of the variant.
+		self.eval_stack = []
+
+		# Best root move of the running iteration, (move, score) once a root move
+		# has been searched fully. Used when the iteration is aborted.
+		self.root_best = None
+
+		# Lazy SMP helpers shuffle root moves with this seed to diversify their
+		# search (None = normal ordering), see lazy_smp.py
+		self.root_shuffle_seed = None
+
+		# Killer moves: store 2 killer moves per ply
+		# killer_moves[ply] = [move1, move2]
+		self.killer_moves = [[None, None] for _ in range(MAX_KILLER_PLY)]
+
+		# Quiet move statistics, learned from beta cutoffs:
+		# history[turn * 4096 + from * 64 + to] (butterfly history),
+		# counter_moves[previous piece_key] = refutation of the previous move,
+		# continuation_history[previous piece_key][piece_key] = history after that move
+		self.history = [0] * 8192
+		self.counter_moves = [None] * (14 * 64)
+		self.continuation_history = {}
+
+	def set_variant(self, variant):
+		"""Switch the variant searched, the table is kept."""
+		rules = get_variant(variant)
+		if getattr(self, "variant", None) != variant:
+			self.clear_eval_cache()
+			# Endgame solver, its proofs are kept from move to move
+			self.solver = rules.solver() if rules.solver else None
+		self.variant = variant
+		self.rules = rules
+		self.psqt = PSQT[self.rules.psqt]
+
+	def set_tt_size(self, size_mb):
+		"""Resize (and clear) the transposition table."""
+		self.transposition_table.resize(size_mb)
+
+	def new_game(self, variant=None):
+		"""Forget everything learned in the previous game."""
+		if variant is not None:
+			self.set_variant(variant)
+		self.transposition_table.clear()
+		self.clear_eval_cache()
+		self.pawn_table.clear()
+		if self.solver:
+			self.solver.clear()
+		self.clear_killers()
+		self.clear_history()
+
+	def clear_eval_cache(self):
+		"""Empty the evaluation cache."""
+		# eval_cache_keys[hash & mask] = full hash of the cached position,
+		# eval_cache_scores[...] = its static eval from white's point of view
+		self.eval_cache_keys = [None] * EVAL_CACHE_SIZE
+		self.eval_cache_scores = [0] * EVAL_CACHE_SIZE
+
+	def stop(self):
+		"""Ask the running search to stop as soon as possible."""
+		self.stop_requested = True
+
+	def check_stop(self):
+		"""Called every NODE_CHECK_INTERVAL nodes, raises SearchAborted if out of time or nodes."""
+		self.nodes_until_check = NODE_CHECK_INTERVAL
+		if self.stop_requested:
+			raise SearchAborted()
+		if self.hard_deadline is not None and time.time() >= self.hard_deadline:
+			raise SearchAborted()
+		if self.max_nodes is not None and self.poscount + self.qnodes >= self.max_nodes:
+			raise SearchAborted()
+
+	def push_move(self, node, move):
+		"""Make a move and incrementally update the position hash."""
+		before = zobrist.snapshot(node)
+		node.push(move)
+		changes = zobrist.piece_changes(before, node)
+		self.hash_stack.append(zobrist.update_hash(self.hash_stack[-1], before, node, changes))
+		self.pawn_hash_stack.append(zobrist.update_pawn_hash(self.pawn_hash_stack[-1], changes))
+
+		psqt = self.psqt
+		material = self.eval_stack[-1]
+		for color, piece_type, square, sign in changes:
+			material += sign * psqt[(color * 7 + piece_type) * 64 + square]
+		self.eval_stack.append(material)
+
+	def pop_move(self, node):
+		"""Unmake the last move pushed with push_move."""
+		node.pop()
+		self.hash_stack.pop()
+		self.pawn_hash_stack.pop()
+		self.eval_stack.pop()
+
+	def reset_search_stacks(self, node):
+		"""Start a new search from node."""
+		# Hash the game positions back to the last irreversible move
+		reversible = min(node.halfmove_clock, len(node.move_stack))
+		history = []
+		if reversible:
+			board = node.copy(stack=reversible)
+			for _ in range(reversible):
+				board.pop()
+				history.append(zobrist.hash_board(board))
+			history.reverse()
+
+		self.hash_stack[:] = history + [zobrist.hash_board(node)]
+		self.root_index = len(history)
+		self.null_index = 0
+		self.pawn_hash_stack[:] = [zobrist.pawn_hash(node)]
+		self.eval_stack[:] = [material_pst(node, self.rules.psqt)]
+
+	def unwind(self, node, ply):
+		"""Undo moves left on the board by an aborted search."""
+		while len(self.hash_stack) > self.root_index + ply + 1:
+			self.pop_move(node)
+		if self.null_index >= len(self.hash_stack):
+			self.null_index = 0
+
+	def is_repetition(self, node):
+		"""
+		Has the current position occurred before (in the game or on the search path)?
+		Only positions since the last irreversible move can repeat, and only
+		with the same side to move, so at most halfmove_clock / 2 hashes are compared.
+		A null move counts as irreversible (it moves the halfmove clock on).
+		"""
+		hash_stack = self.hash_stack
+		h = hash_stack[-1]
+		i = len(hash_stack) - 5  # A repetition needs at least 4 plies
+		stop = len(hash_stack) - 1 - node.halfmove_clock
+		if stop < self.null_index:
+			stop = self.null_index
+		while i >= stop:
+			if hash_stack[i] == h:
+				return True
+			i -= 2
+		return False
+
+	def draw_score(self, node, color):
+		"""
+		Score of a draw with contempt: if we're ahead, a draw is bad;
+		if we're behind, a draw is good.
+		"""
 		# Get static evaluation to determine if we're winning or losing
-		static_eval = get_static_eval(node, color, variant)
+		static_eval = self.get_static_eval(node, color)
 		if static_eval > 100:
 			# We're winning - a draw is bad, penalize it heavily
-			return (-200, None)
+			return -200
 		elif static_eval < -100:
 			# We're losing - a draw is good
-			return (200, None)
+			return 200
 		else:
 			# Roughly equal - draw is fine
-			return (0, None)
-
-	if (depth <= 1 and node.is_check()):
-		depth += 1
-
-	if node.is_variant_end():
-		return (get_static_eval(node, color, variant), None)
-
-	if depth == 0:
-		# Use quiescence search instead of static eval
-		return (quiesce(node, a, b, color, variant), None)
-
-	# Null move pruning
-	# Skip if: in check, low depth, or null move not allowed (to prevent consecutive nulls)
-	# Also skip in antichess (zugzwang is common) and when we have few pieces
-	# Skip at root (ply == 0) or when beta is inf (no bound to beat)
-	in_check = node.is_check()
-	if (null_move_allowed and not in_check and depth >= 3 and ply > 0 and
-		variant != "antichess" and len(node.piece_map()) > 6 and b < inf):
-		# Reduction: R = 2 + depth/4 (adaptive)
-		R = 2 + depth // 4
-		# Make null move
-		node.push(chess.Move.null())
-		# Search with reduced depth and null window
-		null_score = -negamax(node, -b, -b + 1, -color, variant, depth - 1 - R, ply + 1,
-							  null_move_allowed=False)[0]
-		node.pop()
+			return 0
+
+	def pawn_score(self, node):
+		"""Pawn structure score of node (white's point of view), from the pawn hash table."""
+		return self.pawn_table.probe(self.pawn_hash_stack[-1], node)
+
+	def get_static_eval(self, node, color):
+		"""
+		Get static evaluation for the position.
+		Material and PST come from eval_stack, the rest from the
+		static_eval of the variant. Results are cached
+		by position hash (hash_stack[-1] has to belong to node).
+		"""
+		self.eval_probes += 1
+		pos_hash = self.hash_stack[-1]
+		index = pos_hash & (EVAL_CACHE_SIZE - 1)
+		if self.eval_cache_keys[index] == pos_hash:
+			self.eval_hits += 1
+			return self.eval_cache_scores[index] * color
+
+		score = self.rules.static_eval(self, node, color, self.eval_stack[-1])
+		self.eval_cache_keys[index] = pos_hash
+		self.eval_cache_scores[index] = score
+		return score * color
+
+	def staged_moves(self, board, pv_move=None, tt_move=None, ply=0, shuffle_seed=None, prev_key=None):
+		"""
+		Staged move picker, yields (move, is_capture) in search order:
+		1. PV / TT move, only checked for legality, nothing is generated
+		2. captures and promotions, by the capture_order of the variant
+		3. killer moves and the countermove of the previous move (prev_key)
+		4. remaining quiet moves
+		Each stage is generated only when the previous one ran out
+		without a cutoff.
+		"""
+		them = board.occupied_co[not board.turn]
+		done = []
+
+		# 1. Hash moves
+		for move in (pv_move, tt_move):
+			if move and move not in done and board.is_legal(move):
+				done.append(move)
+				yield move, board.is_capture(move)
+
+		# 2. Captures (including en passant) and promotions
+		score = self.rules.capture_order
+		scored = [(score(board, m), m) for m in board.generate_legal_captures() if m not in done]
+		scored += [(score(board, m), m) for m in promotion_pushes(board) if m not in done]
+		for move in pick_moves(scored):
+			done.append(move)
+			yield move, not move.promotion or bool(chess.BB_SQUARES[move.to_square] & them)
+
+		# 3. Killers and countermove that are quiet and legal here
+		refutations = list(self.killer_moves[ply]) if ply < MAX_KILLER_PLY else []
+		if prev_key is not None:
+			refutations.append(self.counter_moves[prev_key])
+		for move in refutations:
+			if (move and move not in done and not chess.BB_SQUARES[move.to_square] & them and
+				board.is_legal(move)):
+				done.append(move)
+				yield move, False
+
+		# 4. Quiet moves. Generation order (pieces before pawn pushes) beats
+		# sorting by history here, history only drives the reductions.
+		quiets = [m for m in board.generate_legal_moves(chess.BB_ALL, ~them) if m not in done]
+		if shuffle_seed is not None:
+			random.Random(shuffle_seed).shuffle(quiets)
+		ep_square = board.ep_square
+		for move in quiets:
+			if move.to_square == ep_square and board.is_en_passant(move):
+				continue
+			yield move, False
+
+	def store_killer(self, move, ply):
+		"""Store a killer move at the given ply."""
+		if ply >= MAX_KILLER_PLY:
+			return
+		killers = self.killer_moves[ply]
+		# Don't store if it's already the first killer
+		if killers[0] == move:
+			return
+		# Shift: move current first killer to second slot
+		killers[1] = killers[0]
+		killers[0] = move
+
+	def clear_killers(self):
+		"""Clear killer moves table."""
+		for killers in self.killer_moves:
+			killers[0] = killers[1] = None
+
+	def quiet_history(self, board, move, key, prev_key):
+		"""History score of a quiet move: butterfly + continuation history."""
+		score = self.history[board.turn * 4096 + move.from_square * 64 + move.to_square]
+		if prev_key is not None:
+			continuation = self.continuation_history.get(prev_key)
+			if continuation:
+				score += continuation.get(key, 0)
+		return score
+
+	def update_quiet_history(self, board, move, key, prev_key, quiets_tried, depth):
+		"""
+		Reward the quiet move that caused a beta cutoff, and penalize the
+		quiet moves searched before it without one.
+
+		Args:
+			quiets_tried: (move, key) of the quiets searched before move
+		"""
+		bonus = min(32 * depth * depth, HISTORY_BONUS_MAX)
+		history = self.history
+		base = board.turn * 4096
+		continuation = None
+		if prev_key is not None:
+			self.counter_moves[prev_key] = move
+			continuation = self.continuation_history.setdefault(prev_key, {})
+
+		for m, k, b in [(move, key, bonus)] + [(m, k, -bonus) for m, k in quiets_tried]:
+			i = base + m.from_square * 64 + m.to_square
+			history[i] = update_history(history[i], b)
+			if continuation is not None:
+				continuation[k] = update_history(continuation.get(k, 0), b)
+
+	def age_history(self):
+		"""Halve the history scores, so recent searches count more."""
+		self.history = [int(v / 2) for v in self.history]
+		aged = {}
+		for prev_key, continuation in self.continuation_history.items():
+			continuation = {k: int(v / 2) for k, v in continuation.items() if int(v / 2)}
+			if continuation:
+				aged[prev_key] = continuation
+		self.continuation_history = aged
+
+	def clear_history(self):
+		"""Forget all history and countermove statistics."""
+		self.history = [0] * 8192
+		self.counter_moves = [None] * (14 * 64)
+		self.continuation_history = {}
+
+	def new_search(self):
+		"""Reset counters and per-search state before a search starts."""
+		self.poscount = 0
+		self.qnodes = 0
+		self.tt_hits = 0
+		self.tt_probes = 0
+		self.eval_hits = 0
+		self.eval_probes = 0
+		self.pawn_table.reset_stats()
+		self.hard_deadline = None
+		self.stop_requested = False
+		self.nodes_until_check = NODE_CHECK_INTERVAL
+		self.clear_killers()
+		self.age_history()
+		self.transposition_table.new_search()
+
+	def search_depth(self, node, color, depth, prev_score, best_move=None):
+		"""
+		One iteration of iterative deepening, with an aspiration window
+		around prev_score (the score of the previous depth).
+
+		Returns:
+			(score, move) like negamax
+		"""
+		delta = ASPIRATION_WINDOW
+		if depth >= ASPIRATION_MIN_DEPTH and abs(prev_score) < MATE_BOUND:
+			alpha, beta = prev_score - delta, prev_score + delta
+		else:
+			alpha, beta = -INFINITE, INFINITE
+
+		while True:
+			score, move = self.negamax(node, alpha, beta, color, depth, pv_move=best_move)
+			delta *= 2
+			if score <= alpha and alpha > -INFINITE:
+				# Fail low: no root move reached alpha, the scores are only upper bounds
+				alpha = score - delta if delta <= ASPIRATION_MAX else -INFINITE
+			elif score >= beta and beta < INFINITE:
+				# Fail high: search the refutation first on the re-search
+				beta = score + delta if delta <= ASPIRATION_MAX else INFINITE
+				if move is not None:
+					best_move = move
+			else:
+				return score, move
+
+	def quiesce(self, node, a, b, color, qdepth=0, ply=0, checks=0):
+		"""
+		Quiescence search - continue searching captures until position is quiet.
+		This avoids the horizon effect where we evaluate mid-capture.
+		Up to checks quiet checking moves are searched too (Variant.quiesce_checks).
+		"""
+		self.nodes_until_check -= 1
+		if self.nodes_until_check <= 0:
+			self.check_stop()
+
+		# TT lookup for quiescence (use negative depth to distinguish from main search)
+		pos_hash = self.hash_stack[-1]
+		q_depth_key = -qdepth - 1  # -1, -2, -3... for quiescence depths
+		self.tt_probes += 1
+		tt_entry = self.transposition_table.probe(pos_hash)
+		if tt_entry is not None:
+			tt_depth, tt_score, tt_flag, _ = tt_entry
+			tt_score = score_from_tt(tt_score, ply)
+			# Only use TT if it was from same or deeper quiescence search
+			if tt_depth <= q_depth_key:
+				self.tt_hits += 1
+				if tt_flag == EXACT:
+					return tt_score
+				elif tt_flag == LOWERBOUND:
+					a = max(a, tt_score)
+				elif tt_flag == UPPERBOUND:
+					b = min(b, tt_score)
+				if a >= b:
+					return tt_score
+
+		# Check for game end. Only captures and promotions are played here, so
+		# repetitions can't occur; stalemate is checked once no capture is left.
+		if node.is_variant_end():
+			return variant_end_score(node, ply)
+		if node.is_check() and not any(node.generate_legal_moves()):
+			return -MATE_SCORE + ply
+
+		# Stand pat: evaluate current position
+		# The side to move can choose to not capture
+		stand_pat = self.get_static_eval(node, color)
+
+		if stand_pat >= b:
+			return b  # Beta cutoff
+		if stand_pat > a:
+			a = stand_pat
+
+		# Limit quiescence depth
+		if qdepth >= MAX_QUIESCE_DEPTH:
+			return stand_pat
+
+		# Generate and search only captures (and promotions) the variant finds worth it
+		moves = list(node.generate_legal_captures()) + promotion_pushes(node)
+		captures = self.rules.quiesce_captures(node, moves, a - stand_pat)
+
+		# Quiet checks while the check budget lasts
+		checking_moves = quiet_checks(node) if checks > 0 else []
+
+		if not captures and not checking_moves:
+			if not moves and not node.is_check() and not any(node.generate_legal_moves()):
+				# Stalemate: a draw, or a win for the side to move (antichess)
+				return MATE_SCORE - ply if self.rules.stalemate_wins else 0
+			return stand_pat
+
+		alpha_orig = a
+		best_score = stand_pat
+
+		# Captures best first, picked lazily, then quiet checks
+		moves = itertools.chain(((m, checks) for m in pick_moves(captures)),
+								((m, checks - 1) for m in checking_moves))
+		for move, checks_left in moves:
+			self.qnodes += 1
+			self.push_move(node, move)
+			score = -self.quiesce(node, -b, -a, -color, qdepth + 1, ply + 1, checks_left)
+			self.pop_move(node)
+
+			if score > best_score:
+				best_score = score
+
+			if score >= b:
+				# Store in TT before returning
+				self.transposition_table.store(pos_hash, q_depth_key, score_to_tt(score, ply), LOWERBOUND, None)
+				return b  # Beta cutoff
+			if score > a:
+				a = score
+
+		# Store result in TT
+		if best_score <= alpha_orig:
+			tt_flag = UPPERBOUND
+		elif best_score >= b:
+			tt_flag = LOWERBOUND
+		else:
+			tt_flag = EXACT
+		self.transposition_table.store(pos_hash, q_depth_key, score_to_tt(best_score, ply), tt_flag, None)
+
+		return a
+
+	def search(self, node, color, depth, on_iteration=None):
+		"""
+		Iterative deepening search to fixed depth.
+		on_iteration is called as on_iteration(depth, move, score) after each depth.
+		"""
+		self.new_search()
+		self.reset_search_stacks(node)
+		# Keep TT between depths for iterative deepening (don't clear it)
+
+		moves = list(node.legal_moves)
+		if not moves:
+			print('Game over.')
+			return
+
+		best_move = None
+		result = (-INFINITE, None)
+
+		# Iterative deepening: search depth 1, then 2, ..., up to target depth
+		for current_depth in range(1, depth + 1):
+			nodes_before = self.poscount
+			qnodes_before = self.qnodes
+			hits_before = self.tt_hits
+			result = self.search_depth(node, color, current_depth, result[0], best_move)
+			best_move = result[1]
+			nodes_this_depth = self.poscount - nodes_before
+			qnodes_this_depth = self.qnodes - qnodes_before
+			hits_this_depth = self.tt_hits - hits_before
+			print(f"depth {current_depth}: {best_move} (score: {result[0]}, nodes: {nodes_this_depth}, qnodes: {qnodes_this_depth}, tt_hits: {hits_this_depth})")
+			if on_iteration:
+				on_iteration(current_depth, best_move, result[0])
+
+			# A mate within the searched depth can't be improved by searching deeper
+			plies = mate_distance(result[0])
+			if plies is not None and abs(plies) <= current_depth:
+				print(f"Mate in {(abs(plies) + 1) // 2} found at depth {current_depth}")
+				break
+
+		print(f"total nodes: {self.poscount}, qnodes: {self.qnodes}, tt_hits: {self.tt_hits}, eval_hits: {self.eval_hits}/{self.eval_probes}, tt_full: {self.transposition_table.hashfull() / 10:.1f}%")
+		if not best_move:
+			return random.choice(moves)
+		return best_move
+
+	def search_with_time(self, node, color, time_limit, min_depth=1, max_depth=20,
+						 start_depth=1, on_iteration=None, max_nodes=None):
+		"""
+		Iterative deepening search with time limit.
+		Searches until time runs out. New depths are only started before the
+		soft limit (SOFT_TIME_RATIO of time_limit); a depth still running at
+		time_limit is aborted, keeping its best root move if one was fully searched.
+
+		Args:
+			node: Board position
+			color: Side to move (1=white, -1=black)
+			time_limit: Maximum time to search in seconds
+			min_depth: Minimum depth to search (default 1), never aborted
+			max_depth: Maximum depth to search (default 20)
+			start_depth: First iteration depth (default 1)
+			on_iteration: Called as on_iteration(depth, move, score) after each completed depth
+			max_nodes: Abort once this many nodes (incl. quiescence) are searched (default no limit)
+
+		Returns:
+			Best move found
+		"""
+		self.new_search()
+		self.reset_search_stacks(node)
+
+		start_time = time.time()
+		soft_deadline = start_time + time_limit * SOFT_TIME_RATIO
+
+		moves = list(node.legal_moves)
+		if not moves:
+			print('Game over.')
+			return None
+
+		if len(moves) == 1:
+			# Only one legal move, just play it
+			print(f"Only one legal move: {moves[0]}")
+			return moves[0]
+
+		pieces = chess.popcount(node.occupied)
+		if self.solver and (pieces <= SOLVER_MAX_PIECES or
+							(pieces <= SOLVER_MOBILITY_PIECES and len(moves) <= SOLVER_MAX_MOBILITY)):
+			solver_nodes = min(SOLVER_NODES, int(time_limit * SOLVER_NODES_PER_SECOND))
+			won, move = self.solve_ending(node, start_time + time_limit * SOLVER_TIME_RATIO, solver_nodes)
+			if won:
+				if on_iteration:
+					on_iteration(max_depth, move, MATE_BOUND)
+				return move
+			if won is False and time_limit > SOLVER_LOST_TIME:
+				time_limit = SOLVER_LOST_TIME
+				soft_deadline = start_time + time_limit * SOFT_TIME_RATIO
+
+		best_move = None
+		best_score = -INFINITE
+		completed_depth = 0
+
+		for current_depth in range(start_depth, max_depth + 1):
+			# Don't start a new depth after the soft deadline
+			if current_depth > min_depth and time.time() >= soft_deadline:
+				print(f"Stopping: soft time limit reached before depth {current_depth}")
+				break
+
+			# The minimum depths always run to completion
+			may_abort = current_depth > min_depth
+			self.hard_deadline = start_time + time_limit if may_abort else None
+			self.max_nodes = max_nodes if may_abort else None
+
+			nodes_before = self.poscount
+			depth_start = time.time()
+			self.root_best = None
 
-		# If null move fails high, we can prune
-		if null_score >= b:
-			return (b, None)
+			try:
+				result = self.search_depth(node, color, current_depth, best_score, best_move)
+			except SearchAborted:
+				self.unwind(node, 0)
+				# Keep the partial result if a root move was searched fully
+				if self.root_best is not None:
+					best_move, best_score = self.root_best
+					print(f"depth {current_depth} (partial): {best_move} (score: {best_score:.1f})")
+				print(f"Search stopped during depth {current_depth}")
+				break
+
+			depth_time = time.time() - depth_start
+			elapsed = time.time() - start_time
 
-	moves = list(node.legal_moves)
-	moves = order_moves(node, moves, pv_move, tt_move, ply)
+			# Only update best move if we completed this depth
+			if result[1] is not None:
+				best_move = result[1]
+				best_score = result[0]
+				completed_depth = current_depth
+
+				nodes_this_depth = self.poscount - nodes_before
+				print(f"depth {current_depth}: {best_move} (score: {best_score:.1f}, nodes: {nodes_this_depth}, time: {depth_time:.2f}s, total: {elapsed:.2f}s)")
+
+				if on_iteration:
+					on_iteration(current_depth, best_move, best_score)
+
+			# A mate within the searched depth can't be improved by searching deeper
+			plies = mate_distance(best_score)
+			if plies is not None and abs(plies) <= completed_depth:
+				print(f"Mate in {(abs(plies) + 1) // 2} found at depth {current_depth}")
+				break
+
+		self.hard_deadline = None
+		self.max_nodes = None
+
+		total_time = time.time() - start_time
+		print(f"Search complete: depth {completed_depth}, nodes: {self.poscount}, qnodes: {self.qnodes}, eval_hits: {self.eval_hits}/{self.eval_probes}, time: {total_time:.2f}s")
+
+		if not best_move:
+			return random.choice(moves)
+		return best_move
+
+	def solve_ending(self, node, deadline, max_nodes=SOLVER_NODES):
+		"""
+		Try to solve node with the variant's endgame solver.
+
+		Args:
+			deadline: time.time() at which the solver gives up
+			max_nodes: node budget of each of the two proofs tried
+
+		Returns:
+			(True, winning move) if the side to move is proven to win, (False, None)
+			if the opponent is proven to win, (None, None) if unsolved
+		"""
+		def should_stop():
+			return self.stop_requested or time.time() >= deadline
+
+		start_time = time.time()
+		# Game positions before the root, see reset_search_stacks
+		history = self.hash_stack[:-1]
+		won, move = self.solver.solve(node, node.turn, max_nodes, should_stop, history)
+		nodes = self.solver.nodes
+		if won and move is not None:
+			print(f"Solver: proven win with {move} (nodes: {nodes}, time: {time.time() - start_time:.2f}s)")
+			return True, move
+		if won is False:
+			# We can't win, maybe we can't avoid losing either
+			lost, _ = self.solver.solve(node, not node.turn, max_nodes, should_stop, history)
+			nodes += self.solver.nodes
+			if lost:
+				print(f"Solver: proven loss (nodes: {nodes}, time: {time.time() - start_time:.2f}s)")
+				return False, None
+		print(f"Solver: unsolved (nodes: {nodes}, time: {time.time() - start_time:.2f}s)")
+		return None, None
+
+	def negamax(self, node, a, b, color, depth=DEPTH, ply=0, pv_move=None, null_move_allowed=True):
+		self.nodes_until_check -= 1
+		if self.nodes_until_check <= 0:
+			self.check_stop()
+
+		pv_node = ply == 0 or b - a > 1
+
+		# Draws by repetition and the 50-move rule depend on the path,
+		# so check them before the transposition table
+		if ply > 0:
+			if node.halfmove_clock >= 100 or self.is_repetition(node):
+				return (self.draw_score(node, color), None)
+
+			# Mate distance pruning: a mate found closer to the root
+			# can't be beaten from here
+			a = max(a, -MATE_SCORE + ply)
+			b = min(b, MATE_SCORE - ply - 1)
+			if a >= b:
+				return (a, None)
+
+		alpha_orig = a
+
+		# Transposition table lookup
+		pos_hash = self.hash_stack[-1]
+		tt_move = None
+		self.tt_probes += 1
+		tt_entry = self.transposition_table.probe(pos_hash)
+		if tt_entry is not None:
+			tt_depth, tt_score, tt_flag, tt_move = tt_entry
+			tt_score = score_from_tt(tt_score, ply)
+
+			if tt_depth >= depth:
+				self.tt_hits += 1
+				if tt_flag == EXACT:
+					return (tt_score, tt_move)
+				elif tt_flag == LOWERBOUND:
+					a = max(a, tt_score)
+				elif tt_flag == UPPERBOUND:
+					b = min(b, tt_score)
+
+				if a >= b:
+					return (tt_score, tt_move)
+
+		if node.is_variant_end():
+			return (variant_end_score(node, ply), None)
+
+		in_check = node.is_check()
+		if in_check and (depth <= 1 or (self.rules.extend_check and self.rules.extend_check(node))):
+			depth += 1
+
+		if depth == 0:
+			# Use quiescence search instead of static eval
+			return (self.quiesce(node, a, b, color, 0, ply, self.rules.quiesce_checks), None)
+
+		pruning = self.pruning
+		can_prune = (self.rules.forward_pruning and not pv_node and not in_check and
+					 abs(a) < MATE_BOUND and abs(b) < MATE_BOUND)
+		futile = False
+		late_move_count = None
+		if can_prune:
+			static_eval = self.get_static_eval(node, color)
+
+			# Reverse futility pruning: too far above beta to fail low
+			if (pruning["reverse_futility"] and depth <= REVERSE_FUTILITY_DEPTH and
+				static_eval - REVERSE_FUTILITY_MARGIN * depth >= b):
+				return (static_eval, None)
+
+			# Razoring: too far below alpha for a quiet move to help,
+			# unless quiescence finds some tactics
+			if pruning["razoring"] and depth <= RAZOR_DEPTH and static_eval + RAZOR_MARGIN * depth <= a:
+				score = self.quiesce(node, a, a + 1, color, 0, ply, self.rules.quiesce_checks)
+				if score <= a:
+					return (score, None)
+
+			# Futility pruning: quiet moves can't bring the eval up to alpha
+			futile = pruning["futility"] and depth <= FUTILITY_DEPTH and static_eval + FUTILITY_MARGIN * depth <= a
+
+			# Late move pruning: only the first few quiet moves are searched
+			if pruning["late_move"] and depth <= LATE_MOVE_DEPTH:
+				late_move_count = LATE_MOVE_COUNTS[depth]
+
+		# Null move pruning
+		# Skip if: in check, low depth, or null move not allowed (to prevent consecutive nulls)
+		# Also skip where the variant forbids it (zugzwang) and when we have few pieces
+		# Skip at root (ply == 0) or when beta is a mate score (a null move can't prove a mate)
+		if (null_move_allowed and not in_check and depth >= 3 and ply > 0 and
+			self.rules.null_move and len(node.piece_map()) > 6 and b < MATE_BOUND):
+			# Reduction: R = 2 + depth/4 (adaptive)
+			R = 2 + depth // 4
+			# Make null move
+			self.push_move(node, chess.Move.null())
+			null_index = self.null_index
+			self.null_index = len(self.hash_stack) - 1
+			# Search with reduced depth and null window
+			null_score = -self.negamax(node, -b, -b + 1, -color, depth - 1 - R, ply + 1,
+									   null_move_allowed=False)[0]
+			self.null_index = null_index
+			self.pop_move(node)
+
+			# If null move fails high, we can prune
+			if null_score >= b:
+				return (b, None)
+
+		shuffle_seed = None
+		if ply == 0 and self.root_shuffle_seed is not None:
+			shuffle_seed = self.root_shuffle_seed + depth
+		prev_key = previous_move_key(node)
+		moves = self.staged_moves(node, pv_move, tt_move, ply, shuffle_seed, prev_key)
+
+		best_move = None
+		best_value = -INFINITE
+		moves_searched = 0
+		quiets_tried = []
+
+		for move, is_capture in moves:
+			self.poscount += 1
+			is_promotion = move.promotion is not None
+			if not is_capture:
+				key = piece_key(node, move)
+				history_score = self.quiet_history(node, move, key, prev_key) if moves_searched >= 4 else 0
 
-	best_move = None
-	best_value = -inf
-	moves_searched = 0
+			self.push_move(node, move)
+			gives_check = node.is_check()
 
-	for move in moves:
-		poscount += 1
-		is_capture = node.is_capture(move)
-		is_promotion = move.promotion is not None
+			if (moves_searched and not is_capture and not is_promotion and not gives_check and
+				(futile or (late_move_count is not None and len(quiets_tried) >= late_move_count))):
+				self.pop_move(node)
+				continue
 
-		node.push(move)
-		gives_check = node.is_check()
-
-		# Late Move Reductions (LMR)
-		# For later moves that aren't tactical, search at reduced depth first
-		do_full_search = True
-		if (moves_searched >= 4 and depth >= 3 and
-			not is_capture and not is_promotion and not gives_check and not in_check):
-			# Reduction amount: more reduction for later moves and higher depths
-			reduction = 1 + (moves_searched // 8) + (depth // 4)
-			reduction = min(reduction, depth - 1)  # Don't reduce below depth 1
-
-			# Reduced depth search with null window
-			result = negamax(node, -a - 1, -a, -color, variant, depth - 1 - reduction, ply + 1)
-			value = -result[0]
-
-			# If reduced search doesn't fail low, we need full re-search
-			do_full_search = (value > a)
-
-		if do_full_search:
-			# Principal Variation Search (PVS): use null window after first move
-			if moves_searched == 0:
-				result = negamax(node, -b, -a, -color, variant, depth - 1, ply + 1)
-				value = -result[0]
-			else:
-				# Null window search
-				result = negamax(node, -a - 1, -a, -color, variant, depth - 1, ply + 1)
+			# Late Move Reductions (LMR)
+			# For later moves that aren't tactical, search at reduced depth first
+			do_full_search = True
+			if (moves_searched >= 4 and depth >= 3 and
+				not is_capture and not is_promotion and not gives_check and not in_check):
+				# Reduction amount: more reduction for later moves and higher depths,
+				# and for quiets that keep failing low elsewhere (negative history)
+				reduction = 1 + (moves_searched // 8) + (depth // 4)
+				if history_score < 0:
+					reduction -= int(history_score / LMR_HISTORY_DIVISOR)
+				reduction = min(reduction, depth - 1)  # Don't reduce below depth 1
+
+				# Reduced depth search with null window
+				result = self.negamax(node, -a - 1, -a, -color, depth - 1 - reduction, ply + 1)
 				value = -result[0]
-				# Re-search with full window if it might improve alpha
-				if value > a and value < b:
-					result = negamax(node, -b, -a, -color, variant, depth - 1, ply + 1)
+
+				# If reduced search doesn't fail low, we need full re-search
+				do_full_search = (value > a)
+
+			if do_full_search:
+				# Principal Variation Search (PVS): use null window after first move
+				if moves_searched == 0:
+					result = self.negamax(node, -b, -a, -color, depth - 1, ply + 1)
 					value = -result[0]
+				else:
+					# Null window search
+					result = self.negamax(node, -a - 1, -a, -color, depth - 1, ply + 1)
+					value = -result[0]
+					# Re-search with full window if it might improve alpha
+					if value > a and value < b:
+						result = self.negamax(node, -b, -a, -color, depth - 1, ply + 1)
+						value = -result[0]
 
-		node.pop()
-		moves_searched += 1
+			self.pop_move(node)
+			moves_searched += 1
 
-		if value > best_value:
-			best_value = value
-			best_move = move
+			if value > best_value:
+				best_value = value
+				best_move = move
+				if ply == 0 and value > a:
+					# Only a root move inside the aspiration window is a usable result
+					self.root_best = (move, value)
 
-		a = max(a, value)
+			a = max(a, value)
+
+			if a >= b:
+				# Beta cutoff - store killer move and history if it's not a capture
+				if not is_capture:
+					self.store_killer(move, ply)
+					self.update_quiet_history(node, move, key, prev_key, quiets_tried, depth)
+				break
 
-		if a >= b:
-			# Beta cutoff - store killer move if it's not a capture
 			if not is_capture:
-				store_killer(move, ply)
-			break
-
-	# Store in transposition table
-	# Replacement strategy: always replace if deeper or same depth
-	if best_value <= alpha_orig:
-		tt_flag = UPPERBOUND
-	elif best_value >= b:
-		tt_flag = LOWERBOUND
-	else:
-		tt_flag = EXACT
-
-	# Check if we should store
-	should_store = True
-	if pos_hash in transposition_table:
-		existing_depth = transposition_table[pos_hash][0]
-		# Only replace if our search is at least as deep
-		should_store = depth >= existing_depth
-	elif len(transposition_table) >= TT_SIZE:
-		# Table full - find and replace shallowest entry (simple approach)
-		# For better performance, could use a more sophisticated scheme
-		should_store = True  # Always try to store, will evict oldest
-
-	if should_store:
-		# If table is full, remove a random entry to make room
-		if len(transposition_table) >= TT_SIZE:
-			# Simple eviction: remove first item (approximates FIFO)
-			try:
-				first_key = next(iter(transposition_table))
-				del transposition_table[first_key]
-			except StopIteration:
-				pass
-		transposition_table[pos_hash] = (depth, best_value, tt_flag, best_move)
+				quiets_tried.append((move, key))
+
+		if moves_searched == 0:
+			# No legal moves: checkmate or stalemate
+			if in_check:
+				return (-MATE_SCORE + ply, None)
+			return (MATE_SCORE - ply if self.rules.stalemate_wins else 0, None)
+
+		# Store in transposition table
+		# Replacement strategy: depth-preferred slot, else always-replace slot
+		if best_value <= alpha_orig:
+			tt_flag = UPPERBOUND
+		elif best_value >= b:
+			tt_flag = LOWERBOUND
+		else:
+			tt_flag = EXACT
+
+		self.transposition_table.store(pos_hash, depth, score_to_tt(best_value, ply), tt_flag, best_move)
+
+		return (best_value, best_move)
+
 
-	return (best_value, best_move)
+# Searcher used by the module-level search functions, created on first use
+# so importing the engine doesn't allocate a transposition table
+default_searcher = None
+
+def get_default_searcher(variant):
+	"""default_searcher, created if needed and set to variant."""
+	global default_searcher
+	if default_searcher is None:
+		default_searcher = Searcher(variant)
+	default_searcher.set_variant(variant)
+	return default_searcher
+
+def search(node, color, variant, depth, on_iteration=None):
+	"""Fixed-depth search with default_searcher, see Searcher.search."""
+	return get_default_searcher(variant).search(node, color, depth, on_iteration)
+
+def search_with_time(node, color, variant, time_limit, **kwargs):
+	"""Timed search with default_searcher, see Searcher.search_with_time."""
+	return get_default_searcher(variant).search_with_time(node, color, time_limit, **kwargs)
 
 
 if __name__ == "__main__":
-	board = chess.Board()
+	parser = argparse.ArgumentParser(description="Play Bottios in the terminal, you are white")
+	parser.add_argument("--variant", choices=sorted(VARIANTS), default="standard")
+	parser.add_argument("--depth", type=int, default=4)
+	args = parser.parse_args()
+
+	board = VARIANTS[args.variant].board()
+	searcher = Searcher(args.variant)
 	moves = []
 
 	c = 0
@@ -556,13 +1320,13 @@ if __name__ == "__main__":
 				continue
 		else:
 			start_time = time.time()
-			move = search(board, color=-1, variant="standard", depth=4)
+			move = searcher.search(board, color=-1, depth=args.depth)
 			elapsed = time.time() - start_time
 			print("--- %s moves ---" % (len(list(board.legal_moves))))
-			print("--- number of nodes: %s --" % poscount)
+			print("--- number of nodes: %s --" % searcher.poscount)
 			print("--- %s seconds ---" % (elapsed))
 			if elapsed > 0:
-				print("--- nodes per second: %s ---" % str(poscount / elapsed))
+				print("--- nodes per second: %s ---" % str(searcher.poscount / elapsed))
 
 		print(move)
 		moves.append(str(move))
@@ -1,28 +1,45 @@
+"""
+Antichess evaluation on bitboards.
+
+The side that loses all its pieces wins, so the base score is the piece
+count difference, ANTICHESS_PIECE_VALUE per piece (what PSQT["antichess"]
+keeps incrementally). Captures are forced: a side that can capture has
+to, and the fewer captures it can choose from, the easier the opponent
+can feed it pieces.
+"""
 import chess
-from pprint import pprint
-from .piece_square_tables import variant_pst
+from .piece_square_tables import ANTICHESS_PIECE_VALUE
 
-cols = "ABCDEFGH"
-rows = "12345678"
+FORCED_CAPTURE_PENALTY = (0, 40, 25, 15)  # Side that can capture, by its number of captures (3 = 3 or more)
 
-def create_fields():
-	return [(col + row) for col in cols for row in rows]
 
-fields = create_fields()
+def capture_count(node, color):
+    """Number of captures color has, en passant ignored."""
+    ours = node.occupied_co[color]
+    them = node.occupied_co[not color]
+    count = 0
+    for square in chess.scan_forward(node.pawns & ours):
+        count += chess.popcount(chess.BB_PAWN_ATTACKS[color][square] & them)
+    for square in chess.scan_forward(ours & ~node.pawns):
+        count += chess.popcount(node.attacks_mask(square) & them)
+    return count
 
-def antichess_evaluate(node, color, variant="antichess"):
-    pieces = ""
 
-    for field in fields:
-        piece = node.piece_at(getattr(chess, field))
+def forced_captures(node):
+    """Forced capture terms from white's point of view."""
+    return (FORCED_CAPTURE_PENALTY[min(capture_count(node, chess.BLACK), 3)] -
+            FORCED_CAPTURE_PENALTY[min(capture_count(node, chess.WHITE), 3)])
 
-        if piece:
-            p = str(piece)
-            pieces += p
 
-    w_pieces = sum(1 for c in pieces if c.isupper())
-    b_pieces = sum(1 for c in pieces if c.islower())
+def antichess_evaluate(node, material=None):
+    """
+    Antichess evaluation from white's point of view.
 
-    score = b_pieces - w_pieces
-
-    return score
+    Args:
+        material: piece count score of the position if the caller keeps it
+                  incrementally (PSQT["antichess"]), otherwise computed here
+    """
+    if material is None:
+        material = ANTICHESS_PIECE_VALUE * (chess.popcount(node.occupied_co[chess.BLACK]) -
+                                            chess.popcount(node.occupied_co[chess.WHITE]))
+    return material + forced_captures(node)
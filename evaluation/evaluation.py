@@ -1,64 +1,46 @@
 import chess
-from .piece_square_tables import (
-    PST_WHITE, PST_BLACK, PIECE_VALUES, ATOMIC_PIECE_VALUES, variant_pst
-)
+from .piece_square_tables import PSQT
+from .pawns import pawn_structure, board_pawns
 
-def evaluate(node, color, variant="standard"):
+def material_pst(node, variant="standard"):
     """
-    Optimized evaluation function.
-    Uses piece_map() and pre-computed PST lookups for speed.
+    Material + PST score from white's point of view, using the merged
+    integer PSQT table. This is what the search keeps incrementally.
     """
+    table = PSQT[variant]
     score = 0
 
-    # Select the right piece values and PSTs for this variant
-    if variant == "atomic":
-        piece_values = ATOMIC_PIECE_VALUES
-    else:
-        piece_values = PIECE_VALUES
-
-    pst_white = PST_WHITE[variant]
-    pst_black = PST_BLACK[variant]
-
-    # Use piece_map() - only iterates over squares with pieces
-    for square, piece in node.piece_map().items():
-        piece_type = piece.piece_type
-
-        if piece.color == chess.WHITE:
-            # White piece: add material and PST value
-            score += piece_values[piece_type]
-            score += pst_white[piece_type][square]
-        else:
-            # Black piece: subtract material and PST value
-            score -= piece_values[piece_type]
-            score -= pst_black[piece_type][square]
-
-    # Atomic variant: penalize king safety (attackers near enemy king)
-    if variant == "atomic":
-        score += _atomic_king_safety(node, color)
+    for color in chess.COLORS:
+        base = color * 7 * 64
+        for square in chess.scan_forward(node.occupied_co[color]):
+            score += table[base + node.piece_type_at(square) * 64 + square]
 
     return score
 
 
-def _atomic_king_safety(node, color):
-    """Evaluate king safety for atomic chess (attackers near enemy king)."""
-    score = 0
+def evaluate(node, material=None, pawns=None):
+    """
+    Standard evaluation from white's point of view: material, PST and
+    pawn structure.
+
+    Args:
+        material: material_pst() of the position if the caller keeps it
+                  up to date incrementally, otherwise it is computed here
+        pawns: pawn_structure() of the position if the caller has it from
+               a pawn hash table, otherwise it is computed here
+    """
+    if material is None:
+        material = material_pst(node)
+    if pawns is None:
+        pawns = pawn_structure(*board_pawns(node))
+    return material + pawns
 
-    # Find enemy king
-    if color == 1:  # We are white, check black king safety
-        enemy_king_sq = node.king(chess.BLACK)
-        if enemy_king_sq is not None:
-            # Count white attackers on squares adjacent to black king
-            for adj_sq in _get_adjacent_squares_fast(enemy_king_sq):
-                attackers = len(node.attackers(chess.WHITE, adj_sq))
-                score += 200 * attackers
-    else:  # We are black, check white king safety
-        enemy_king_sq = node.king(chess.WHITE)
-        if enemy_king_sq is not None:
-            for adj_sq in _get_adjacent_squares_fast(enemy_king_sq):
-                attackers = len(node.attackers(chess.BLACK, adj_sq))
-                score -= 200 * attackers
 
-    return score
+def atomic_evaluate(node, color, material=None, pawns=None):
+    """Atomic evaluation: evaluate() with the atomic PST, and attacks next to the enemy king."""
+    if material is None:
+        material = material_pst(node, "atomic")
+    return evaluate(node, material, pawns) + atomic_king_safety(node, color)
 
 
 # Pre-computed adjacent squares for each square (0-63)
@@ -77,12 +59,76 @@ for sq in range(64):
     _ADJACENT_SQUARES.append(tuple(adj))
 _ADJACENT_SQUARES = tuple(_ADJACENT_SQUARES)
 
+# Neighbourhood of each square as a bitboard
+_KING_ZONES = tuple(sum(chess.BB_SQUARES[adj] for adj in squares) for squares in _ADJACENT_SQUARES)
+
+
+def _zone_reach(attacks):
+    """Per king square: squares from which attacks (square -> bitboard) can hit its zone."""
+    reach = []
+    for zone in _KING_ZONES:
+        mask = 0
+        for square in chess.scan_forward(zone):
+            mask |= attacks(square)
+        reach.append(mask)
+    return tuple(reach)
+
+
+# Pieces outside these masks can't attack the zone, even on an empty board
+_KNIGHT_REACH = _zone_reach(lambda sq: chess.BB_KNIGHT_ATTACKS[sq])
+_KING_REACH = _zone_reach(lambda sq: chess.BB_KING_ATTACKS[sq])
+_SLIDER_REACH = _zone_reach(lambda sq: (chess.BB_RANK_ATTACKS[sq][0] | chess.BB_FILE_ATTACKS[sq][0] |
+                                        chess.BB_DIAG_ATTACKS[sq][0]))
+
+ATOMIC_ZONE_ATTACK = 200  # Per attack on a square next to the enemy king
+
 
 def _get_adjacent_squares_fast(square):
     """Get adjacent squares using pre-computed lookup."""
     return _ADJACENT_SQUARES[square]
 
 
+def _zone_attacks(node, color, king):
+    """
+    Attacks of color on the squares next to king, counting every
+    (piece, square) pair, so a square attacked twice counts twice.
+    """
+    zone = _KING_ZONES[king]
+    ours = node.occupied_co[color]
+
+    pawns = node.pawns & ours
+    if color == chess.WHITE:
+        left = (pawns & ~chess.BB_FILE_A) << 7
+        right = (pawns & ~chess.BB_FILE_H) << 9
+    else:
+        left = (pawns & ~chess.BB_FILE_A) >> 9
+        right = (pawns & ~chess.BB_FILE_H) >> 7
+    count = chess.popcount(left & zone) + chess.popcount(right & zone)
+
+    for square in chess.scan_forward(node.knights & ours & _KNIGHT_REACH[king]):
+        count += chess.popcount(chess.BB_KNIGHT_ATTACKS[square] & zone)
+    for square in chess.scan_forward(node.kings & ours & _KING_REACH[king]):
+        count += chess.popcount(chess.BB_KING_ATTACKS[square] & zone)
+    sliders = (node.bishops | node.rooks | node.queens) & ours & _SLIDER_REACH[king]
+    for square in chess.scan_forward(sliders):
+        count += chess.popcount(node.attacks_mask(square) & zone)
+    return count
+
+
+def atomic_king_safety(node, color):
+    """Evaluate king safety for atomic chess (attackers near enemy king)."""
+    if color == 1:  # We are white, check black king safety
+        enemy_king_sq = node.king(chess.BLACK)
+        if enemy_king_sq is None:
+            return 0
+        return ATOMIC_ZONE_ATTACK * _zone_attacks(node, chess.WHITE, enemy_king_sq)
+    else:  # We are black, check white king safety
+        enemy_king_sq = node.king(chess.WHITE)
+        if enemy_king_sq is None:
+            return 0
+        return -ATOMIC_ZONE_ATTACK * _zone_attacks(node, chess.BLACK, enemy_king_sq)
+
+
 # Keep old functions for backwards compatibility if needed elsewhere
 def get_piece_value(piece, variant="standard"):
     """Legacy function for backwards compatibility."""
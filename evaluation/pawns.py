@@ -0,0 +1,135 @@
+"""
+Pawn structure evaluation on bitboards, cached in a pawn hash table.
+
+The pawn structure only changes on pawn moves, captures of pawns and
+promotions, so most positions of a search share it with their parent.
+PawnHashTable keeps pawn_structure() scores keyed by a Zobrist key of
+the pawns alone (zobrist.pawn_hash), which the search updates
+incrementally.
+"""
+import chess
+
+DOUBLED_PENALTY = 15  # Per extra pawn on a file
+ISOLATED_PENALTY = 12  # Per pawn without friendly pawns on the adjacent files
+PASSED_BONUS = (0, 5, 10, 20, 35, 60, 100, 0)  # By rank, seen from the pawn's side
+
+PAWN_TABLE_SIZE = 1 << 14  # Entries, must be a power of two
+
+
+def _build_adjacent_files():
+    masks = []
+    for file in range(8):
+        mask = 0
+        if file > 0:
+            mask |= chess.BB_FILES[file - 1]
+        if file < 7:
+            mask |= chess.BB_FILES[file + 1]
+        masks.append(mask)
+    return tuple(masks)
+
+
+def _build_passed_masks():
+    """
+    PASSED_MASKS[color][square]: squares in front of a pawn of color on
+    square, on its own and the adjacent files. No enemy pawn there = passed.
+    """
+    masks = ([], [])
+    for square in chess.SQUARES:
+        file, rank = chess.square_file(square), chess.square_rank(square)
+        files = chess.BB_FILES[file] | ADJACENT_FILES[file]
+        ahead_white = 0
+        for r in range(rank + 1, 8):
+            ahead_white |= chess.BB_RANKS[r]
+        ahead_black = 0
+        for r in range(rank):
+            ahead_black |= chess.BB_RANKS[r]
+        masks[chess.WHITE].append(files & ahead_white)
+        masks[chess.BLACK].append(files & ahead_black)
+    return (tuple(masks[0]), tuple(masks[1]))
+
+
+ADJACENT_FILES = _build_adjacent_files()
+PASSED_MASKS = _build_passed_masks()
+
+
+def _side_score(pawns, enemy_pawns, color):
+    """Doubled, isolated and passed pawn terms for the pawns of one side."""
+    score = 0
+
+    for file_mask, adjacent in zip(chess.BB_FILES, ADJACENT_FILES):
+        on_file = pawns & file_mask
+        if not on_file:
+            continue
+        count = chess.popcount(on_file)
+        if count > 1:
+            score -= DOUBLED_PENALTY * (count - 1)
+        if not pawns & adjacent:
+            score -= ISOLATED_PENALTY * count
+
+    passed_masks = PASSED_MASKS[color]
+    for square in chess.scan_forward(pawns):
+        # A pawn behind a friendly pawn is not passed, the front one is
+        if not passed_masks[square] & (enemy_pawns | (pawns & chess.BB_FILES[square & 7])):
+            rank = square >> 3
+            score += PASSED_BONUS[rank if color == chess.WHITE else 7 - rank]
+
+    return score
+
+
+def pawn_structure(white_pawns, black_pawns):
+    """
+    Pawn structure score from white's point of view.
+
+    Args:
+        white_pawns: bitboard of the white pawns
+        black_pawns: bitboard of the black pawns
+    """
+    return (_side_score(white_pawns, black_pawns, chess.WHITE) -
+            _side_score(black_pawns, white_pawns, chess.BLACK))
+
+
+def board_pawns(board):
+    """(white pawns, black pawns) bitboards of board."""
+    return (board.pawns & board.occupied_co[chess.WHITE],
+            board.pawns & board.occupied_co[chess.BLACK])
+
+
+class PawnHashTable():
+    """
+    Direct-mapped cache of pawn_structure(), one entry per slot.
+
+    Indexed by the low bits of the pawn key and verified with the full key,
+    hits / probes gives the hit rate since the last reset_stats().
+    """
+
+    def __init__(self, size=PAWN_TABLE_SIZE):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        """Empty the table and reset the counters."""
+        self.keys = [None] * self.size
+        self.scores = [0] * self.size
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.probes = 0
+
+    def probe(self, key, board):
+        """
+        Pawn structure score of board (white's point of view).
+
+        Args:
+            key: pawn-only Zobrist key of board, see zobrist.pawn_hash
+        """
+        self.probes += 1
+        index = key & (self.size - 1)
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+
+        score = pawn_structure(*board_pawns(board))
+        self.keys[index] = key
+        self.scores[index] = score
+        return score
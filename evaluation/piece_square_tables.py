@@ -189,6 +189,7 @@ def _flatten_pst_black(table):
 # Piece values indexed by piece type (1=PAWN, 2=KNIGHT, 3=BISHOP, 4=ROOK, 5=QUEEN, 6=KING)
 PIECE_VALUES = (0, 100, 350, 370, 525, 1000, 1000000)  # index 0 unused
 ATOMIC_PIECE_VALUES = (0, 100, 150, 150, 300, 600, 1000000)
+ANTICHESS_PIECE_VALUE = 100  # Every piece, counted against its side
 
 # Pre-computed PSTs for white pieces, indexed by piece_type then square
 PST_WHITE = {
@@ -234,4 +235,41 @@ PST_BLACK = {
         _flatten_pst_black(atomic_king),
     ),
 }
-PST_BLACK["threeCheck"] = PST_BLACK["standard"]
\ No newline at end of file
+PST_BLACK["threeCheck"] = PST_BLACK["standard"]
+
+# ============================================
+# Merged integer material + PST table
+# PSQT[variant][(color * 7 + piece_type) * 64 + square], from white's point
+# of view: white entries are positive, black entries negative.
+# A position's material + PST score is the sum over its pieces, so it can
+# be updated from the pieces a move adds and removes.
+# ============================================
+
+def psqt_index(color, piece_type, square):
+    return (color * 7 + piece_type) * 64 + square
+
+def _build_psqt(piece_values, pst_white, pst_black):
+    table = [0] * (2 * 7 * 64)
+    for piece_type in chess.PIECE_TYPES:
+        for sq in range(64):
+            table[psqt_index(chess.WHITE, piece_type, sq)] = int(round(
+                piece_values[piece_type] + pst_white[piece_type][sq]))
+            table[psqt_index(chess.BLACK, piece_type, sq)] = -int(round(
+                piece_values[piece_type] + pst_black[piece_type][sq]))
+    return tuple(table)
+
+def _build_piece_count_table():
+    """Antichess: every piece counts ANTICHESS_PIECE_VALUE, losing pieces is good."""
+    table = [0] * (2 * 7 * 64)
+    for piece_type in chess.PIECE_TYPES:
+        for sq in range(64):
+            table[psqt_index(chess.WHITE, piece_type, sq)] = -ANTICHESS_PIECE_VALUE
+            table[psqt_index(chess.BLACK, piece_type, sq)] = ANTICHESS_PIECE_VALUE
+    return tuple(table)
+
+PSQT = {
+    "standard": _build_psqt(PIECE_VALUES, PST_WHITE["standard"], PST_BLACK["standard"]),
+    "atomic": _build_psqt(ATOMIC_PIECE_VALUES, PST_WHITE["atomic"], PST_BLACK["atomic"]),
+    "antichess": _build_piece_count_table(),
+}
+PSQT["threeCheck"] = PSQT["standard"]
@@ -1,95 +1,111 @@
+"""
+Three-check evaluation on bitboards.
+
+Material is popcounts of the piece bitboards, piece-square terms come from
+the flat tables in piece_square_tables (the integer PSQT["threeCheck"] the
+search keeps incrementally is built from them). On top come the checks
+each side has given and the pieces ready to give the next one.
+"""
 import chess
-from pprint import pprint
-from .piece_square_tables import variant_pst
+from .piece_square_tables import PIECE_VALUES, PST_WHITE, PST_BLACK
+from .pawns import pawn_structure, board_pawns
 
-cols = "ABCDEFGH"
-rows = "12345678"
+CHECKS_GIVEN_SCORE = (1000000, 2400, 444, 0)  # By remaining checks of a side, 0 = lost
 
-def create_fields():
-	return [(col + row) for col in cols for row in rows]
 
-fields = create_fields()
+def piece_bitboards(node):
+    """Bitboards of all pawns, knights, bishops, rooks, queens and kings, by piece type - 1."""
+    return (node.pawns, node.knights, node.bishops, node.rooks, node.queens, node.kings)
 
-def field_to_coords(field):
-    x, y = field[0], field[1]
 
-    col = "ABCDEFGH".find(x)
-    row = 8 - int(y)
-
-    return(row,col) 
-
-def get_piece_value(piece, variant="threecheck"):
-    piece_score = {
-        "p": 100,
-        "n": 350,
-        "b": 370,
-        "r": 525,
-        "q": 1000,
-        "k": 1000000
-    }
-
-    value = piece_score.get(piece.lower())        
-
-    if (piece.islower()):
-        return -value
-
-    return value
-
-def threecheck_eval(node, color, variant="standard"):
+def material_score(node, piece_values=PIECE_VALUES):
+    """Material from white's point of view, piece_values indexed by piece type."""
+    white = node.occupied_co[chess.WHITE]
+    black = node.occupied_co[chess.BLACK]
     score = 0
+    for value, pieces in zip(piece_values[1:], piece_bitboards(node)):
+        score += value * (chess.popcount(pieces & white) - chess.popcount(pieces & black))
+    return score
 
-    if (color == 1):
-        if node.remaining_checks[chess.WHITE] == 1:
-            score += 2400
-        if node.remaining_checks[chess.WHITE] == 2:
-            score += 444
-
-        if (node.remaining_checks[chess.WHITE] == 0):
-            score += 1000000
-
-        if node.remaining_checks[chess.BLACK] == 1:
-            score -= 2400
-        if node.remaining_checks[chess.BLACK] == 2:
-            score -= 444
-
-        if (node.remaining_checks[chess.BLACK] == 0):
-            score -= 1000000       
-
-    elif (color == 0):
-        if node.remaining_checks[chess.BLACK] == 1:
-            score += 2400
-        if node.remaining_checks[chess.BLACK] == 2:
-            score += 444
-
-        if (node.remaining_checks[chess.BLACK] == 0):
-            score += 1000000
-
-        if node.remaining_checks[chess.WHITE] == 1:
-            score -= 2400
-        if node.remaining_checks[chess.WHITE] == 2:
-            score -= 444
-
-        if (node.remaining_checks[chess.WHITE] == 0):
-            score -= 1000000         
-
-    for field in fields:
-        piece = node.piece_at(getattr(chess, field))
-
-        if piece:
-            p = str(piece)
-
-            score += get_piece_value(p, variant)
-            field_coords = field_to_coords(field)
-
-            piece_value = variant_pst[variant][p.lower()]
-
-            if p.islower():
-                piece_value = variant_pst[variant][p][::-1]
-
-            if p.islower():
-                score -= piece_value[field_coords[0]][field_coords[1]]
-            else:
-                score += piece_value[field_coords[0]][field_coords[1]]
 
+def pst_score(node, variant="threeCheck"):
+    """Piece-square terms from white's point of view."""
+    white = node.occupied_co[chess.WHITE]
+    black = node.occupied_co[chess.BLACK]
+    score = 0
+    for piece_type, pieces in zip(chess.PIECE_TYPES, piece_bitboards(node)):
+        table = PST_WHITE[variant][piece_type]
+        for square in chess.scan_forward(pieces & white):
+            score += table[square]
+        table = PST_BLACK[variant][piece_type]
+        for square in chess.scan_forward(pieces & black):
+            score -= table[square]
     return score
 
+
+def remaining_checks_score(node):
+    """Score for the checks both sides have given so far, white's point of view."""
+    remaining = node.remaining_checks
+    return (CHECKS_GIVEN_SCORE[max(remaining[chess.WHITE], 0)] -
+            CHECKS_GIVEN_SCORE[max(remaining[chess.BLACK], 0)])
+
+
+CHECK_THREAT_BONUS = (0, 60, 25, 10)  # Per piece able to give check, by remaining checks of its side
+
+
+def checking_pieces(node, color):
+    """
+    Number of knights, bishops, rooks and queens of color with a move to a
+    square that gives check. Pins, pawns and discovered checks are ignored.
+    """
+    king = node.king(not color)
+    if king is None:
+        return 0
+    ours = node.occupied_co[color]
+    occupied = node.occupied
+
+    # Squares from which each kind of piece would attack the king
+    knight_squares = chess.BB_KNIGHT_ATTACKS[king] & ~ours
+    diagonal = chess.BB_DIAG_ATTACKS[king][chess.BB_DIAG_MASKS[king] & occupied] & ~ours
+    straight = (chess.BB_RANK_ATTACKS[king][chess.BB_RANK_MASKS[king] & occupied] |
+                chess.BB_FILE_ATTACKS[king][chess.BB_FILE_MASKS[king] & occupied]) & ~ours
+
+    count = 0
+    for square in chess.scan_forward(node.knights & ours):
+        if chess.BB_KNIGHT_ATTACKS[square] & knight_squares:
+            count += 1
+    for square in chess.scan_forward((node.bishops | node.rooks | node.queens) & ours):
+        targets = 0
+        if node.bishops & chess.BB_SQUARES[square]:
+            targets = diagonal
+        elif node.rooks & chess.BB_SQUARES[square]:
+            targets = straight
+        else:
+            targets = diagonal | straight
+        if node.attacks_mask(square) & targets:
+            count += 1
+    return count
+
+
+def check_threats(node):
+    """Score for the pieces ready to give check, white's point of view."""
+    remaining = node.remaining_checks
+    return (CHECK_THREAT_BONUS[max(remaining[chess.WHITE], 0)] * checking_pieces(node, chess.WHITE) -
+            CHECK_THREAT_BONUS[max(remaining[chess.BLACK], 0)] * checking_pieces(node, chess.BLACK))
+
+
+def threecheck_eval(node, material=None, pawns=None):
+    """
+    Three-check evaluation from white's point of view.
+
+    Args:
+        material: material + PST score of the position if the caller keeps it
+                  incrementally (PSQT["threeCheck"]), otherwise computed here
+        pawns: pawn_structure() of the position if the caller has it from
+               a pawn hash table, otherwise computed here
+    """
+    if material is None:
+        material = int(round(material_score(node) + pst_score(node)))
+    if pawns is None:
+        pawns = pawn_structure(*board_pawns(node))
+    return material + pawns + remaining_checks_score(node) + check_threats(node)
@@ -0,0 +1,101 @@
+"""
+Lazy SMP: helper processes search the same root as the main process and
+share what they learn through a transposition table in shared memory.
+
+Helpers use different start depths and root move orders, so they fill the
+table with entries the main search would only reach later. The result is
+the best move of the deepest iteration completed by any process.
+"""
+import io
+import contextlib
+import multiprocessing
+from multiprocessing import shared_memory
+
+import engine
+from transposition import TranspositionTable, encode_move, decode_move
+
+# Per helper: completed depth, encoded move, score
+RESULT_FIELDS = 3
+
+
+def _helper(index, results, searcher, node, color, time_limit):
+	"""
+	Helper process: search node until time_limit, publishing each completed depth.
+	Forked from the main process, so the searcher's transposition table
+	already maps the shared memory.
+	"""
+	searcher.root_shuffle_seed = index + 1
+
+	def publish(depth, move, score):
+		base = index * RESULT_FIELDS
+		results[base + 1] = encode_move(move)
+		results[base + 2] = int(max(-2 ** 62, min(2 ** 62, score)))
+		results[base] = depth  # written last, marks the entry complete
+
+	with contextlib.redirect_stdout(io.StringIO()):
+		searcher.search_with_time(node, color, time_limit,
+								  start_depth=1 + (index + 1) % 2, on_iteration=publish)
+
+
+class LazySMP():
+	"""
+	Parallel search for one game with the given Searcher.
+
+	The searcher's table is moved to shared memory for as long as the object
+	lives, so it stays warm between moves, and its local buffer is freed
+	meanwhile. Call close() at the end of the game. Helpers are forked, so this needs the 'fork' start method
+	(Linux, macOS with fork).
+	"""
+
+	def __init__(self, searcher, threads, size_mb=engine.TT_SIZE_MB):
+		self.searcher = searcher
+		self.threads = max(1, threads)
+		self.size_mb = size_mb
+		self.shm = shared_memory.SharedMemory(create=True, size=TranspositionTable.buffer_size(size_mb))
+		self.local_size_mb = searcher.transposition_table.size_mb
+		# Drops the local buffer, only the shared one is kept
+		searcher.transposition_table.resize(size_mb, buffer=self.shm.buf)
+		self.context = multiprocessing.get_context('fork')
+
+	def search(self, node, color, time_limit):
+		"""search_with_time with threads - 1 helper processes."""
+		helpers = self.threads - 1
+		results = self.context.RawArray('q', helpers * RESULT_FIELDS)
+
+		processes = []
+		for index in range(helpers):
+			p = self.context.Process(target=_helper, args=(
+				index, results, self.searcher, node.copy(), color, time_limit))
+			p.daemon = True
+			p.start()
+			processes.append(p)
+
+		main_result = []
+		try:
+			move = self.searcher.search_with_time(node, color, time_limit,
+												  on_iteration=lambda d, m, s: main_result.append((d, m, s)))
+		finally:
+			for p in processes:
+				p.terminate()
+			for p in processes:
+				p.join()
+
+		best_depth = main_result[-1][0] if main_result else 0
+		for index in range(helpers):
+			depth, move_code, score = results[index * RESULT_FIELDS:(index + 1) * RESULT_FIELDS]
+			helper_move = decode_move(move_code)
+			if depth > best_depth and helper_move in node.legal_moves:
+				print(f"helper {index}: depth {depth}: {helper_move} (score: {score})")
+				best_depth = depth
+				move = helper_move
+
+		print(f"Lazy SMP: {self.threads} threads, deepest completed depth {best_depth}")
+		return move
+
+	def close(self):
+		"""Free the shared memory and give the searcher a new, empty local table."""
+		table = self.searcher.transposition_table
+		table.release()
+		self.shm.close()
+		self.shm.unlink()
+		table.resize(self.local_size_mb)
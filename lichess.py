@@ -1,25 +1,34 @@
+import time
+STARTED = time.time()  # Startup time is reported from here
+
 import requests
 import json
 import multiprocessing
-from multiprocessing import Pool
-import engine
 import logging_pool
 import chess
 from keys import AUTHENTICATION_TOKEN
-from engine import search_with_time, calculate_move_time
+from engine import Searcher, VARIANTS, get_variant, calculate_move_time
+from lazy_smp import LazySMP
+from ponder import Ponderer
 import random
-from opening_book import Book
-import chess.variant
+from opening_book import build_snapshots, load_book, load_variant_books, outdated_snapshots, weighted_choice
 
 BASE_URL = 'https://lichess.org/'
 BOT_ID = 'bottios'
 headers = {'Authorization': 'Bearer %s' % AUTHENTICATION_TOKEN}
 
-standard_book = Book("penguin.book")
-atomic_black = Book("atomic_black.book")
-atomic_white = Book("atomic_white.book")
-threecheck_white = Book("threecheck_white.book")
-threecheck_black = Book("threecheck_black.book")
+# Search processes per game (main + Lazy SMP helpers) by game speed.
+# More threads make one game stronger, but leave fewer cores for other games.
+SEARCH_THREADS = {
+	'bullet': 1,
+	'blitz': 1,
+	'rapid': 2,
+	'classical': 4,
+	'correspondence': 4,
+}
+
+# Search our reply to the expected move while the opponent thinks
+PONDER = True
 
 def accept_challenge(game_id):
 	print('ACCEPTING_CHALLENGE')
@@ -76,9 +85,6 @@ def stream_events(event_queue):
 			event_queue.put_nowait({'type': 'ping'})
 
 def play_game(game_id, event_queue):
-	start_color = 1
-	my_time = 'btime'
-	my_inc = 'binc'
 	game_stream = game_updates(game_id).iter_lines()
 
 	print('GAME_STREAM')
@@ -87,59 +93,71 @@ def play_game(game_id, event_queue):
 	game = json.loads(next(game_stream).decode('utf-8'))
 	variant = game['variant']['key']
 
+	# Fresh search state per game: nothing leaks from the previous game
+	searcher = Searcher(variant)
+	threads = SEARCH_THREADS.get(game.get('speed'), 1)
+	smp = LazySMP(searcher, threads) if threads > 1 else None
+	ponderer = Ponderer(searcher) if PONDER else None
+	try:
+		_play_game(game_id, game_stream, game, variant, searcher, smp, ponderer)
+	finally:
+		if ponderer:
+			ponderer.stop()
+			print(ponderer.report())
+		if smp:
+			smp.close()
+
+def think(board, color, time_limit, searcher, smp):
+	"""Search with Lazy SMP helpers if the game has them."""
+	if smp:
+		return smp.search(board, color, time_limit)
+	return searcher.search_with_time(board, color=color, time_limit=time_limit)
+
+def _play_game(game_id, game_stream, game, variant, searcher, smp, ponderer):
+	start_color = 1
+	my_time = 'btime'
+	my_inc = 'binc'
+	their_time = 'wtime'
+
 	in_book = True
 	current_book = None
 	moves_played = 0
 
-	if variant == 'atomic':
-		board = chess.variant.AtomicBoard()
-	elif variant == 'antichess':
-		board = chess.variant.GiveawayBoard()
-	elif variant == 'threeCheck':
-		board = chess.variant.ThreeCheckBoard()
-	elif variant == 'standard':
-		current_book = standard_book
-		print("Choosing book standard_book")
-		board = chess.Board()
-	else:
+	rules = get_variant(variant)
+	if rules.name != variant:
 		print(f"Unknown variant {variant}, defaulting to standard")
-		board = chess.Board()
+	board = rules.board()
 
 	fens = []
+	our_color = chess.BLACK
 
 	if game['white']['id'] == BOT_ID:
 		start_color = -1
 		my_time = 'wtime'
 		my_inc = 'winc'
+		their_time = 'btime'
+		our_color = chess.WHITE
 
-		if variant == 'atomic':
-			print("Choosing book atomic_white")
-			current_book = atomic_white
-		elif variant == 'threeCheck':
-			print("Choosing book threecheck_white")
-			current_book = threecheck_white
+	book_file = rules.books.get(our_color)
+	if book_file:
+		print(f"Choosing book {book_file}")
+		current_book = load_book(book_file)
 
+	if our_color == chess.WHITE:
 		# Determine first move as white
+		book_moves = current_book.get_moves(board) if current_book else []
 		if variant == 'antichess':
 			bot_move = random.choice(['e2e3', 'b2b3', 'g2g3'])
-		elif current_book:
-			book_move = current_book.get_moves([])
-			bot_move = random.choice(book_move)
+		elif book_moves:
+			bot_move = weighted_choice(book_moves)
 		else:
 			# Fallback: use engine for first move
-			bot_move = search_with_time(board, color=-start_color, variant=variant, time_limit=1.0)
+			bot_move = think(board, -start_color, 1.0, searcher, smp)
 
 		print(f"First move as white: {bot_move}")
 		make_move(game_id, bot_move)
 		# Don't push here - we'll sync from game state
 		fens.append(board.fen()[:-9].strip())
-	elif game['black']['id'] == BOT_ID:
-		if variant == 'atomic':
-			print("Choosing book atomic_black")
-			current_book = atomic_black
-		elif variant == 'threeCheck':
-			print("Choosing book threecheck_black")
-			current_book = threecheck_black
 
 	for event in game_stream:
 		try:
@@ -191,22 +209,24 @@ def play_game(game_id, event_queue):
 
 			moves_played = len(moves) // 2  # Approximate moves by this side
 
+			# Looked up by position, so transpositions stay in book
 			if (in_book and current_book):
-				book_move = current_book.get_moves(moves)
+				book_moves = current_book.get_moves(board)
 			else:
-				book_move = None
+				book_moves = []
 
-			if in_book and not book_move:
+			if in_book and not book_moves:
 				print(in_book)
 				chat(game_id, "I'm out of book! :O")
 				print("Out of book!")
 				in_book = False
 
-			if book_move:
+			if book_moves:
+				if ponderer:
+					ponderer.stop()
 				print("Book moves:")
-				print(book_move)
-				bot_move = random.choice(book_move)
-				bot_move = chess.Move.from_uci(bot_move)
+				print([(move.uci(), weight) for move, weight in book_moves])
+				bot_move = weighted_choice(book_moves)
 			else:
 				# Calculate time for this move based on clock
 				time_remaining = upd.get(my_time, 60000)  # Default 60s if missing
@@ -214,7 +234,12 @@ def play_game(game_id, event_queue):
 				move_time = calculate_move_time(time_remaining, increment, moves_played)
 				print(f"Time remaining: {time_remaining/1000:.1f}s, increment: {increment/1000:.1f}s, thinking for: {move_time:.2f}s")
 
-				bot_move = search_with_time(board, color=-start_color, variant=variant, time_limit=move_time)
+				bot_move = None
+				if ponderer and board.move_stack:
+					# Ponder hit: play instantly or search only the time not yet spent
+					bot_move, move_time = ponderer.resolve(board.peek(), move_time)
+				if bot_move is None:
+					bot_move = think(board, -start_color, move_time, searcher, smp)
 
 			print(f"Playing: {bot_move}")
 
@@ -223,6 +248,8 @@ def play_game(game_id, event_queue):
 				print(f"Move response: {response}")
 				board.push(bot_move)
 				fens.append(board.fen()[:-9].strip())
+				if ponderer and not in_book:
+					ponderer.start(board, -start_color, upd.get(their_time, 60000) / 1000.0)
 			except Exception as e:
 				print(f"Error making move: {e}")
 				import traceback
@@ -233,8 +260,20 @@ if __name__ == '__main__':
 	challenge_queue = []
 	event_queue = manager.Queue()
 
+	# Compiling books takes seconds, so missing or outdated snapshots are
+	# built in the background. Each game calls load_book(), which opens a
+	# book once it exists and again once it has been rebuilt.
+	if outdated_snapshots(VARIANTS):
+		book_build = multiprocessing.Process(target=build_snapshots, args=[VARIANTS], daemon=True)
+		book_build.start()
+
+	# Open the books before the pool forks: the game processes then share
+	# the mapped pages instead of each opening them on its first game
+	books_time = load_variant_books(VARIANTS)
+
 	control_stream = multiprocessing.Process(target=stream_events, args=[event_queue])
 	control_stream.start()
+	print(f"Startup took {time.time() - STARTED:.2f}s (books: {books_time * 1000:.0f} ms)")
 
 	with logging_pool.LoggingPool(10) as pool:
 		while True:
@@ -253,8 +292,7 @@ if __name__ == '__main__':
 				print(f"Challenge from {challenger_name}: variant={variant}, speed={speed}, time={time_control}")
 
 				# Check if variant is supported
-				supported_variants = ['standard', 'atomic', 'antichess', 'threeCheck']
-				if variant not in supported_variants:
+				if variant not in VARIANTS:
 					print(f"Declining challenge from {challenger_name}: unsupported variant {variant}")
 					decline_challenge(_id, reason='variant')
 					continue
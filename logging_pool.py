@@ -15,7 +15,7 @@ class LogExceptions(object):
         try:
             result = self.__callable(*args, **kwargs)
 
-        except Exception as e:
+        except Exception:
             # Here we add some debugging help. If multiprocessing's
             # debugging is on, it will arrange to log the traceback
             error(traceback.format_exc())
@@ -27,6 +27,28 @@ class LogExceptions(object):
         return result
 
 
+class NonDaemonProcess(multiprocessing.get_context('fork').Process):
+    # Pool workers are daemonic by default, and daemonic processes may not
+    # start children. Games searching with Lazy SMP helpers need to.
+    # Workers are always forked, whatever the default start method, so they
+    # inherit the opened books and Lazy SMP's shared table.
+    @property
+    def daemon(self):
+        return False
+
+    @daemon.setter
+    def daemon(self, value):
+        pass
+
+
+class NonDaemonContext(type(multiprocessing.get_context('fork'))):
+    Process = NonDaemonProcess
+
+
 class LoggingPool(Pool):
+    def __init__(self, processes=None, *args, **kwargs):
+        kwargs.setdefault('context', NonDaemonContext())
+        Pool.__init__(self, processes, *args, **kwargs)
+
     def apply_async(self, func, args=(), kwds={}, callback=None):
         return Pool.apply_async(self, LogExceptions(func), args, kwds, callback)
@@ -1,14 +1,44 @@
+"""
+Opening books, compiled from text to binary Polyglot-format books.
+
+The text books in books/ hold one game or line per row as UCI moves.
+Each compiles to a snapshot with .bin added to its name, e.g.
+penguin.book.bin. The snapshot holds 16-byte big-endian records (key,
+move, weight, learn) sorted by key, which is the Polyglot format. Keys
+are zobrist.hash_board():
+- for standard chess this is the Polyglot hash
+- for the variants it adds the variant salt and the remaining checks
+
+A position is found whatever the move order that reached it. A move's
+weight is the number of book games that played it there.
+
+Books are read through mmap and binary search, so nothing is parsed
+into Python objects. The pages are shared by every process that opens
+the book, including forked pool workers.
+
+Compiling takes seconds, so it is never done when a book is opened.
+`python opening_book.py` builds the missing or outdated snapshots, e.g.
+on deploy. lichess.py runs the same build in the background if needed,
+and load_book() opens a snapshot again once it has been rebuilt.
+A snapshot is only ever written from its text book, so a .bin made by
+book_builder.py is never overwritten.
+"""
+import mmap
+import os
+import random
+import re
+import struct
+import time
 from collections import defaultdict
-from functools import reduce
-import operator
-import json
-from pprint import pprint
+
 import chess
-import chess.pgn
-import re
 
-def tree(): return defaultdict(tree)
-def dicts(tree): return {k: dicts(tree[k]) for k in tree}
+import zobrist
+
+BOOK_DIR = 'books'
+ENTRY = struct.Struct('>QHHI')  # key, move, weight, learn (see book_builder.py)
+MAX_WEIGHT = 0xFFFF
+SNAPSHOT_SUFFIX = '.bin'  # Added to a text book's name for its compiled book
 
 
 def reformat(pgn):
@@ -19,58 +49,250 @@ def reformat(pgn):
 	return [move for move in moves.split(' ') if move]
 
 
-def create_book_from_pgn(pgn, outfile):
-	pgn = open('zergei_3check_white.pgn')
-	game = chess.pgn.read_game(pgn)
+def encode_book_move(board, move):
+	"""
+	Polyglot move encoding: to file, to rank, from file, from rank and
+	promotion (knight 1 ... queen 4) in 3 bits each. Castling is the king
+	capturing its rook. None for moves Polyglot can't encode (antichess
+	king promotions).
+	"""
+	to_square = move.to_square
+	if board.is_castling(move):
+		to_square = chess.square(7 if board.is_kingside_castling(move) else 0,
+								 chess.square_rank(move.from_square))
+	promotion = 0
+	if move.promotion:
+		if move.promotion == chess.KING:
+			return None
+		promotion = move.promotion - 1
+	return to_square | move.from_square << 6 | promotion << 12
+
+
+def decode_book_move(board, raw):
+	"""Move of a Polyglot move encoding on board, None if it isn't legal there."""
+	from_square = (raw >> 6) & 0x3F
+	to_square = raw & 0x3F
+	promotion = (raw >> 12) & 0x7
+	if (board.kings & chess.BB_SQUARES[from_square] and
+			board.rooks & board.occupied_co[board.turn] & chess.BB_SQUARES[to_square]):
+		# King takes own rook: castling
+		to_square = chess.square(6 if to_square > from_square else 2, chess.square_rank(from_square))
+	move = chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+	return move if board.is_legal(move) else None
+
+
+def count_book_moves(lines, board_class=chess.Board, counts=None):
+	"""
+	Number of games that played each move in each position.
+
+	Args:
+		lines: games as lists of UCI moves, a line stops at its first illegal move
+		counts: dict to add to, from an earlier call
+
+	Returns:
+		counts[(key, encoded move)] = number of games
+	"""
+	if counts is None:
+		counts = defaultdict(int)
+	for line in lines:
+		board = board_class()
+		key = zobrist.hash_board(board)
+		for uci in line:
+			try:
+				move = chess.Move.from_uci(uci)
+			except ValueError:
+				break
+			if not board.is_legal(move):
+				break
+			raw = encode_book_move(board, move)
+			if raw is None:
+				break
+			counts[(key, raw)] += 1
+			before = zobrist.snapshot(board)
+			board.push(move)
+			key = zobrist.update_hash(key, before, board, zobrist.piece_changes(before, board))
+	return counts
+
+
+def book_order(entry):
+	"""Sort key of (key, encoded move, weight, ...) entries: by key, most played move first."""
+	return (entry[0], -entry[2], entry[1])
+
+
+def pack_entries(entries):
+	"""Book records of (key, encoded move, weight, learn) entries, weights above MAX_WEIGHT are capped."""
+	return b''.join(ENTRY.pack(key, raw, min(weight, MAX_WEIGHT), learn) for key, raw, weight, learn in entries)
+
+
+def write_book(entries, path):
+	"""
+	Write a Polyglot book, sorted by key and most played move first.
+
+	Args:
+		entries: (key, encoded move, weight, learn) tuples, weights above
+		         MAX_WEIGHT are capped
+	"""
+	entries = sorted(entries, key=book_order)
+	tmp_path = '%s.%d.tmp' % (path, os.getpid())
+	with open(tmp_path, 'wb') as f:
+		f.write(pack_entries(entries))
+	# Other processes see the old book or the new one, never half a book
+	os.replace(tmp_path, path)
+	return len(entries)
+
+
+def compile_book(text_path, book_path, board_class=chess.Board):
+	"""Compile a text book into a binary book, returns the number of entries."""
+	with open(text_path) as f:
+		lines = [reformat(line) for line in f]
+	counts = count_book_moves(lines, board_class)
+	return write_book(((key, raw, count, 0) for (key, raw), count in counts.items()), book_path)
+
+
+def weighted_choice(book_moves):
+	"""Random move of get_moves() output, by weight."""
+	moves = [move for move, _ in book_moves]
+	weights = [weight for _, weight in book_moves]
+	return random.choices(moves, weights=weights)[0]
+
+
+def snapshot_path(_file):
+	"""Path of the binary book of _file: the snapshot of a text book, or _file if it is a .bin."""
+	if _file.endswith(SNAPSHOT_SUFFIX):
+		return os.path.join(BOOK_DIR, _file)
+	return os.path.join(BOOK_DIR, _file + SNAPSHOT_SUFFIX)
+
 
-	out = open(outfile, "a")
+def variant_text_books(variants):
+	"""(text book, board class) of all variants (engine.VARIANTS)."""
+	books = set()
+	for rules in variants.values():
+		for _file in rules.books.values():
+			if not _file.endswith(SNAPSHOT_SUFFIX):
+				books.add((_file, rules.board))
+	return sorted(books, key=lambda book: book[0])
 
-	c = 0
 
-	while game:
-		print(c)
-		c+=1
-		moves = game.mainline_moves()
-		opening_line = ' '.join([str(move) for move in moves][:60])
-		print(opening_line)
-		out.write(opening_line + "\n")
-		game = chess.pgn.read_game(pgn)
+def outdated_snapshots(variants):
+	"""Text books of variants whose snapshot is missing or older than the text."""
+	outdated = []
+	for _file, board_class in variant_text_books(variants):
+		text_path = os.path.join(BOOK_DIR, _file)
+		book_path = snapshot_path(_file)
+		if os.path.exists(text_path) and (
+				not os.path.exists(book_path) or os.path.getmtime(book_path) < os.path.getmtime(text_path)):
+			outdated.append((_file, board_class))
+	return outdated
+
+
+def build_snapshots(variants):
+	"""
+	Compile the outdated snapshots of variants.
+
+	Returns:
+		Seconds it took
+	"""
+	start = time.time()
+	for _file, board_class in outdated_snapshots(variants):
+		entries = compile_book(os.path.join(BOOK_DIR, _file), snapshot_path(_file), board_class)
+		print(f"{_file}: {entries} entries")
+	return time.time() - start
 
 
 class Book():
-	def __init__(self, _file):		
-		with open('books/' + _file) as f:
-			openings = f.readlines()
-		openings = [reformat(opening) for opening in openings]
+	"""
+	Binary opening book in BOOK_DIR.
 
-		self.book = tree()
+	Args:
+		_file: text book file name, whose snapshot (see build_snapshots) is
+		       opened, or the name of a .bin (e.g. from book_builder.py)
+	"""
 
-		for line in openings:
-			self.add_line(self.book, line)
+	def __init__(self, _file):
+		self.path = snapshot_path(_file)
+		with open(self.path, 'rb') as f:
+			stat = os.fstat(f.fileno())
+			size = stat.st_size
+			self.mtime = stat.st_mtime_ns
+			# mmap can't map an empty file
+			self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+		self.entries = size // ENTRY.size
 
-		self.book_dict = dicts(self.book)
+	def replaced(self):
+		"""True if the file was rewritten (e.g. by build_snapshots) since it was opened."""
+		try:
+			return os.stat(self.path).st_mtime_ns != self.mtime
+		except FileNotFoundError:
+			return False
+
+	def _key_at(self, index):
+		return struct.unpack_from('>Q', self.data, index * ENTRY.size)[0]
+
+	def get_moves(self, board):
+		"""Legal book moves of board as (move, weight), most played first."""
+		key = zobrist.hash_board(board)
+
+		# First entry with the key
+		low, high = 0, self.entries
+		while low < high:
+			middle = (low + high) // 2
+			if self._key_at(middle) < key:
+				low = middle + 1
+			else:
+				high = middle
 
-	def add_line(self, tree, path):
-		if isinstance(path, str):
-			path = path.split(' ')
+		moves = []
+		for index in range(low, self.entries):
+			entry_key, raw, weight, _ = ENTRY.unpack_from(self.data, index * ENTRY.size)
+			if entry_key != key:
+				break
+			move = decode_book_move(board, raw)
+			if move is not None and weight:
+				moves.append((move, weight))
+		return moves
 
-		for node in path:
-			tree = tree[node]
 
-	def get_moves(self, game):
-		book_copy = self.book_dict
+# Books opened by this process, by file name
+_books = {}
+# Books found missing, reported once
+_missing = set()
 
-		for move in game:
-			book_copy = book_copy.get(move, None)
-			if book_copy is None:
-				return []
 
+def load_book(_file):
+	"""
+	Book of _file, opened on the first call in this process that finds it,
+	and again whenever the file has been rewritten since.
+
+	Returns:
+		The Book, or None if it isn't built (yet). A later call opens it
+		once it is, e.g. by build_snapshots() in the background.
+	"""
+	book = _books.get(_file)
+	if book is None or book.replaced():
 		try:
-			return list(book_copy.keys())
-		except:
-			return []
+			book = _books[_file] = Book(_file)
+		except FileNotFoundError:
+			if _file not in _missing:
+				print(f"Opening book {snapshot_path(_file)} not found, playing without it")
+				_missing.add(_file)
+	return book
 
 
-if __name__ == '__main__':
-	create_book_from_pgn("", "zergei_white_2check.book")
+def load_variant_books(variants):
+	"""
+	Open the books of all variants (engine.VARIANTS) that are built, never compiles.
+
+	Returns:
+		Seconds it took
+	"""
+	start = time.time()
+	for rules in variants.values():
+		for _file in set(rules.books.values()):
+			load_book(_file)
+	return time.time() - start
+
 
+if __name__ == '__main__':
+	from engine import VARIANTS
+	elapsed = build_snapshots(VARIANTS)
+	print(f"Books ready in {elapsed:.2f}s")
@@ -0,0 +1,212 @@
+"""
+Depth-first proof-number search (df-pn) for antichess.
+
+Antichess endings are decided by long forced sequences that a depth-limited
+alpha-beta search with a piece-count eval can't see. df-pn searches for a
+proof that one side (the winner) wins, expanding the most-proving node
+first, and needs no evaluation at all.
+
+Proof (pn) and disproof (dn) numbers are kept in a fixed-size,
+direct-mapped table keyed by the Zobrist hash, solved entries are never
+replaced by unsolved ones. A draw counts as a disproof, and so does a
+repetition on the current path, which can only make the solver miss a
+win, never prove a false one. The 50-move rule is ignored.
+"""
+import zobrist
+
+INFINITE_PN = 10 ** 9  # Proof or disproof number of a solved node
+PNS_HASH_SIZE = 1 << 18  # Entries, must be a power of two
+PNS_CHECK_INTERVAL = 256  # Nodes between calls of the stop callback
+PNS_MAX_DEPTH = 300  # Longer lines count as not won, keeps the recursion bounded
+
+# Salt of the hash per winner, so proofs for both sides share the table
+WINNER_KEYS = (0x5E1B8E2D2C44A38F, 0)
+
+
+class SolverAborted(Exception):
+	"""Raised inside the solver when the node budget is used up or it has to stop."""
+	pass
+
+
+def _winner(board):
+	"""Winner of a finished antichess game, None if drawn, False if it goes on."""
+	if not board.occupied_co[board.turn]:
+		return board.turn  # Lost all pieces: won
+	if not board.occupied_co[not board.turn]:
+		return not board.turn
+	if board.is_insufficient_material():
+		return None
+	return False
+
+
+class ProofNumberSearch():
+	"""
+	df-pn solver for chess.variant.GiveawayBoard.
+
+	One instance per game keeps its table from move to move, so the proof
+	found for one move is reused on the next. solve() never runs past its
+	node budget or a stop callback.
+	"""
+
+	def __init__(self, hash_size=PNS_HASH_SIZE):
+		self.hash_size = hash_size
+		self.clear()
+
+	def clear(self):
+		"""Forget all proof and disproof numbers."""
+		self.keys = [None] * self.hash_size
+		self.proof = [0] * self.hash_size
+		self.disproof = [0] * self.hash_size
+		self.nodes = 0
+
+	def probe(self, key):
+		"""(pn, dn) stored for key, None if not in the table."""
+		index = key & (self.hash_size - 1)
+		if self.keys[index] == key:
+			return self.proof[index], self.disproof[index]
+		return None
+
+	def store(self, key, pn, dn):
+		index = key & (self.hash_size - 1)
+		old = self.keys[index]
+		if old is not None and old != key and (self.proof[index] == 0 or self.disproof[index] == 0):
+			if pn and dn:
+				return  # Keep the solved entry
+		self.keys[index] = key
+		self.proof[index] = pn
+		self.disproof[index] = dn
+
+	def solve(self, board, winner, max_nodes, should_stop=None, history=()):
+		"""
+		Try to prove that winner wins from board.
+
+		Args:
+			board: GiveawayBoard, restored before returning
+			winner: chess.WHITE or chess.BLACK
+			max_nodes: budget of positions to expand
+			should_stop: optional callable, the search stops once it returns True
+			history: zobrist.hash_board() keys of earlier game positions, lines
+			         repeating them count as draws so a won game makes progress
+
+		Returns:
+			(result, move): result True if proven (move is a winning move if
+			winner is to move), False if disproven, None if the budget ran out
+		"""
+		self.winner = winner
+		self.nodes = 0
+		self.max_nodes = max_nodes
+		self.should_stop = should_stop
+		self.max_depth = len(history) + PNS_MAX_DEPTH
+		self.path = set(h ^ WINNER_KEYS[winner] for h in history)
+
+		key = zobrist.hash_board(board) ^ WINNER_KEYS[winner]
+		root_ply = len(board.move_stack)
+		try:
+			pn, dn = self._mid(board, key, INFINITE_PN, INFINITE_PN)
+		except SolverAborted:
+			while len(board.move_stack) > root_ply:
+				board.pop()
+			return None, None
+
+		if pn == 0:
+			return True, self._proving_move(board, key) if board.turn == winner else None
+		if dn == 0:
+			return False, None
+		return None, None
+
+	def _proving_move(self, board, key):
+		"""
+		A move of the winner to a proven position, the one leaving the
+		opponent the fewest replies so the win doesn't drag on.
+		"""
+		best, best_replies = None, None
+		for move in board.legal_moves:
+			child = self._push(board, move, key)
+			if self._leaf(board, child)[0] == 0:
+				replies = board.legal_moves.count() if _winner(board) is False else -1
+				if best is None or replies < best_replies:
+					best, best_replies = move, replies
+			board.pop()
+		return best
+
+	def _push(self, board, move, key):
+		"""Make move and return the key of the new position (the winner salt carries over)."""
+		before = zobrist.snapshot(board)
+		board.push(move)
+		return zobrist.update_hash(key, before, board, zobrist.piece_changes(before, board))
+
+	def _leaf(self, board, key):
+		"""(pn, dn) of a position before it is expanded."""
+		finished = _winner(board)
+		if finished is not False:
+			return (0, INFINITE_PN) if finished == self.winner else (INFINITE_PN, 0)
+		if key in self.path or len(self.path) >= self.max_depth:
+			return (INFINITE_PN, 0)  # Repetition: a draw at best
+		entry = self.probe(key)
+		if entry is not None:
+			return entry
+		# Few moves for the side to move: few children to prove or refute it
+		moves = board.legal_moves.count()
+		if not moves:
+			return (0, INFINITE_PN) if board.turn == self.winner else (INFINITE_PN, 0)
+		return (1, moves) if board.turn == self.winner else (moves, 1)
+
+	def _mid(self, board, key, pn_threshold, dn_threshold):
+		"""Expand board until its pn or dn reaches its threshold, returns (pn, dn)."""
+		self.nodes += 1
+		if self.nodes >= self.max_nodes:
+			raise SolverAborted()
+		if self.should_stop and self.nodes % PNS_CHECK_INTERVAL == 0 and self.should_stop():
+			raise SolverAborted()
+
+		or_node = board.turn == self.winner
+		moves = list(board.legal_moves)
+		if not moves:
+			# Stalemate: the side to move wins
+			pn, dn = (0, INFINITE_PN) if or_node else (INFINITE_PN, 0)
+			self.store(key, pn, dn)
+			return pn, dn
+
+		# children[i] = [move, key, pn, dn]
+		children = []
+		for move in moves:
+			child = self._push(board, move, key)
+			children.append([move, child] + list(self._leaf(board, child)))
+			board.pop()
+
+		self.path.add(key)
+		while True:
+			if or_node:
+				pn = min(c[2] for c in children)
+				dn = min(INFINITE_PN, sum(c[3] for c in children))
+			else:
+				pn = min(INFINITE_PN, sum(c[2] for c in children))
+				dn = min(c[3] for c in children)
+			if pn >= pn_threshold or dn >= dn_threshold:
+				break
+
+			# Most proving child, and the thresholds that make it return
+			# once another child becomes more proving (1 + 1/4 slack, as
+			# in df-pn+, so it isn't re-entered over and over)
+			index = 2 if or_node else 3
+			best = second = None
+			for c in children:
+				if best is None or c[index] < best[index]:
+					best, second = c, best
+				elif second is None or c[index] < second[index]:
+					second = c
+			second_value = second[index] if second else INFINITE_PN
+			if or_node:
+				child_pn = min(pn_threshold, second_value + second_value // 4 + 1)
+				child_dn = min(INFINITE_PN, dn_threshold - dn + best[3])
+			else:
+				child_pn = min(INFINITE_PN, pn_threshold - pn + best[2])
+				child_dn = min(dn_threshold, second_value + second_value // 4 + 1)
+
+			board.push(best[0])
+			best[2], best[3] = self._mid(board, best[1], child_pn, child_dn)
+			board.pop()
+		self.path.discard(key)
+
+		self.store(key, pn, dn)
+		return pn, dn
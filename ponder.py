@@ -0,0 +1,109 @@
+"""
+Pondering: search the expected reply while the opponent is thinking.
+
+After we move, the opponent's most likely reply is taken from the
+transposition table and our answer to it is searched in a background
+thread. The main thread only blocks on the game stream meanwhile, so the
+search gets (almost) the whole interpreter. When the opponent moves, a
+correct guess (ponder hit) turns into an instant or shortened search; a
+miss still leaves the warm transposition table behind.
+"""
+import time
+import threading
+
+import zobrist
+
+
+class Ponderer():
+	"""Background pondering for one game with its Searcher, with hit and time-saved statistics."""
+
+	def __init__(self, searcher):
+		self.searcher = searcher
+		self.thread = None
+		self.expected = None
+		self.started = 0
+		self.completed = None  # (depth, move, score) of the last completed ponder depth
+		self.hits = 0
+		self.misses = 0
+		self.time_saved = 0.0
+
+	def expected_reply(self, board):
+		"""The opponent's reply we expect, from the transposition table."""
+		entry = self.searcher.transposition_table.probe(zobrist.hash_board(board))
+		if entry is None or entry[3] is None:
+			return None
+		move = entry[3]
+		return move if move in board.legal_moves else None
+
+	def start(self, board, color, time_limit):
+		"""
+		Start pondering on board (opponent to move).
+
+		Args:
+			color: Our side (1=white, -1=black)
+			time_limit: Upper bound for the ponder search in seconds
+		"""
+		self.stop()
+		self.expected = self.expected_reply(board)
+		if self.expected is None:
+			return
+
+		ponder_board = board.copy()
+		ponder_board.push(self.expected)
+		if ponder_board.is_game_over():
+			self.expected = None
+			return
+
+		print(f"Pondering on {self.expected}")
+		self.completed = None
+		self.started = time.time()
+		self.thread = threading.Thread(target=self._run, args=(ponder_board, color, time_limit), daemon=True)
+		self.thread.start()
+
+	def _run(self, board, color, time_limit):
+		def on_iteration(depth, move, score):
+			self.completed = (depth, move, score)
+
+		self.searcher.search_with_time(board, color, time_limit, on_iteration=on_iteration)
+
+	def stop(self):
+		"""Stop the ponder search, returns seconds spent pondering."""
+		if self.thread is None:
+			return 0.0
+		# The flag is reset when a search starts, so keep asking until it's done
+		while self.thread.is_alive():
+			self.searcher.stop()
+			self.thread.join(0.05)
+		self.thread = None
+		return time.time() - self.started
+
+	def resolve(self, opponent_move, move_time):
+		"""
+		Stop pondering once the opponent has moved.
+
+		Returns:
+			(move, time_left): move is the ponder result to play instantly
+			(or None), time_left the search time still needed for this move
+		"""
+		if self.thread is None:
+			return None, move_time
+
+		pondered = self.stop()
+		if opponent_move != self.expected:
+			self.misses += 1
+			print(f"Ponder miss: expected {self.expected}, got {opponent_move}")
+			return None, move_time
+
+		self.hits += 1
+		saved = min(pondered, move_time)
+		self.time_saved += saved
+		print(f"Ponder hit: {opponent_move}, pondered {pondered:.2f}s")
+
+		if self.completed and pondered >= move_time:
+			return self.completed[1], 0.0
+		return None, move_time - saved
+
+	def report(self):
+		total = self.hits + self.misses
+		rate = 100.0 * self.hits / total if total else 0.0
+		return f"ponder hits: {self.hits}/{total} ({rate:.0f}%), time saved: {self.time_saved:.1f}s"
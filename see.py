@@ -0,0 +1,114 @@
+"""
+Static exchange evaluation (SEE) on bitboards.
+
+see() plays out the exchange on the target square of a capture, each side
+always recapturing with its least valuable attacker, and returns the
+material balance for the side making the capture. Sliders behind a
+capturing piece (x-rays) join in as the square's line opens. Pins and
+checks are ignored, as usual for SEE.
+
+Only meaningful where a capture removes exactly the captured piece, so
+not for atomic (explosions) or antichess (forced captures). atomic_see()
+is the atomic counterpart: a capture there is never answered on the same
+square, so it is just the balance of what the explosion destroys.
+"""
+import chess
+
+SEE_VALUES = [0, 100, 320, 330, 500, 900, 20000]  # by piece type, index 0 = none, also used for move ordering
+
+
+def attackers(board, square, occupied):
+	"""Pieces of both colors attacking square, with only the pieces in occupied on the board."""
+	queens_and_rooks = board.queens | board.rooks
+	queens_and_bishops = board.queens | board.bishops
+	return ((chess.BB_KING_ATTACKS[square] & board.kings) |
+			(chess.BB_KNIGHT_ATTACKS[square] & board.knights) |
+			(chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks) |
+			(chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks) |
+			(chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops) |
+			(chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]) |
+			(chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE])) & occupied
+
+
+def see(board, move):
+	"""
+	Static exchange evaluation of a capture (or promotion).
+
+	Returns:
+		Material won by the side to move, in SEE_VALUES units (negative = losing capture)
+	"""
+	to_square = move.to_square
+	occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+
+	if board.is_en_passant(move):
+		victim = chess.PAWN
+		occupied &= ~chess.BB_SQUARES[board.ep_square ^ 8]
+	else:
+		victim = board.piece_type_at(to_square) or 0
+
+	gain = [SEE_VALUES[victim]]
+	if move.promotion:
+		gain[0] += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+		on_square = move.promotion
+	else:
+		on_square = board.piece_type_at(move.from_square)
+
+	color = not board.turn
+	attacking = attackers(board, to_square, occupied)
+	while True:
+		ours = attacking & board.occupied_co[color]
+		if not ours:
+			break
+
+		# Least valuable attacker recaptures
+		for piece_type in chess.PIECE_TYPES:
+			candidates = ours & board.pieces_mask(piece_type, color)
+			if candidates:
+				break
+
+		# Balance for color if it takes the piece on the square and the exchange stops there
+		gain.append(SEE_VALUES[on_square] - gain[-1])
+
+		occupied &= ~chess.BB_SQUARES[chess.lsb(candidates)]
+		attacking = attackers(board, to_square, occupied)  # Adds x-rays
+		on_square = piece_type
+		color = not color
+
+	# Each side may stop capturing when that is better for it
+	while len(gain) > 1:
+		last = gain.pop()
+		gain[-1] = -max(-gain[-1], last)
+	return gain[0]
+
+
+def atomic_see(board, move):
+	"""
+	Exchange evaluation of a capture (or promotion) in atomic chess.
+
+	The capturing piece, the captured piece and every non-pawn piece next
+	to the target square explode. Blowing up the enemy king wins the
+	game, so it is worth SEE_VALUES[KING]; legal moves never explode our own.
+
+	Returns:
+		Material won by the side to move, in SEE_VALUES units (negative = losing capture)
+	"""
+	to_square = move.to_square
+	from_square = move.from_square
+	gain = SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN] if move.promotion else 0
+
+	if board.is_en_passant(move):
+		victim = chess.PAWN
+	else:
+		victim = board.piece_type_at(to_square)
+		if not victim:
+			return gain  # Quiet promotion, nothing explodes
+
+	# Captured piece and capturing piece (promoted or not, it's gone)
+	gain += SEE_VALUES[victim] - SEE_VALUES[move.promotion or board.piece_type_at(from_square)]
+
+	blast = chess.BB_KING_ATTACKS[to_square] & board.occupied & ~board.pawns & ~chess.BB_SQUARES[from_square]
+	them = board.occupied_co[not board.turn]
+	for square in chess.scan_forward(blast):
+		value = SEE_VALUES[board.piece_type_at(square)]
+		gain += value if chess.BB_SQUARES[square] & them else -value
+	return gain
@@ -0,0 +1,55 @@
+import chess
+import chess.pgn
+import chess.polyglot
+
+from book_builder import BookVisitor, build_book
+
+PGN = "zergei_3check_white.pgn"
+
+
+def sample_pgn(tmp_path, games=200):
+	"""The first games of PGN, as a file of their own."""
+	with open(PGN) as f:
+		text = f.read()
+	end = -1
+	for _ in range(games + 1):
+		end = text.find("[Event ", end + 1)
+	path = tmp_path / "sample.pgn"
+	path.write_text(text[:end])
+	return path
+
+
+def test_chunked_build_equals_serial(tmp_path):
+	pgn = str(sample_pgn(tmp_path))
+	serial = tmp_path / "serial.bin"
+	chunked = tmp_path / "chunked.bin"
+	serial_result = build_book([pgn], str(serial), "threeCheck", processes=1, shards=1)
+	chunked_result = build_book([pgn], str(chunked), "threeCheck", processes=2, shards=5, chunk_size=8 << 10)
+	assert serial_result == chunked_result
+	assert serial.read_bytes() == chunked.read_bytes()
+
+	# Pruned and filtered books agree too
+	build_book([pgn], str(serial), "threeCheck", min_games=2, max_entries=500, processes=1, shards=1)
+	build_book([pgn], str(chunked), "threeCheck", min_games=2, max_entries=500, processes=2, shards=3,
+			   chunk_size=8 << 10)
+	assert serial.read_bytes() == chunked.read_bytes()
+	assert 0 < len(serial.read_bytes()) // 16 <= 500
+
+
+def test_counts_match_one_pass(tmp_path):
+	pgn = sample_pgn(tmp_path, games=50)
+	counts = {}
+	games = 0
+	with open(pgn) as f:
+		while True:
+			visitor = BookVisitor(counts, 40)
+			result = chess.pgn.read_game(f, Visitor=lambda: visitor)
+			if result is None:
+				break
+			games += result
+
+	book = tmp_path / "book.bin"
+	assert build_book([str(pgn)], str(book), processes=2, chunk_size=4 << 10) == (games, len(counts))
+	with chess.polyglot.open_reader(book) as reader:
+		entries = {(entry.key, entry.raw_move): (entry.weight, entry.learn) for entry in reader}
+	assert entries == {move: (count[0], count[1] << 16 | count[2]) for move, count in counts.items()}
@@ -0,0 +1,116 @@
+import os
+
+import chess
+import chess.polyglot
+import chess.variant
+
+import opening_book
+from opening_book import Book, compile_book, encode_book_move, decode_book_move
+
+LINES = [
+	"e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 e1g1 g8f6",
+	"e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1",
+	"e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3 a7a6",
+	"d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7 e2e3 e8g8",
+	"g1f3 d7d5 g2g3 c8g4 f1g2 b8d7 e1g1 e7e5 d2d3 d8e7 b1d2 e8c8",
+	"e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 e1g1",
+]
+
+
+def write_text_book(tmp_path, name="test.book", lines=LINES):
+	with open(tmp_path / name, "w") as f:
+		f.write("\n".join(lines) + "\n")
+	return tmp_path / name
+
+
+def positions(lines=LINES, board_class=chess.Board):
+	"""Every position of the book lines."""
+	for line in lines:
+		board = board_class()
+		for uci in line.split():
+			yield board.copy()
+			board.push_uci(uci)
+
+
+def test_castling_encoding_round_trip():
+	board = chess.Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+	for uci, polyglot in [("e1g1", "e1h1"), ("e1c1", "e1a1")]:
+		move = chess.Move.from_uci(uci)
+		raw = encode_book_move(board, move)
+		assert raw & 0x3F == chess.parse_square(polyglot[2:])
+		assert decode_book_move(board, raw) == move
+	board.turn = chess.BLACK
+	for uci in ["e8g8", "e8c8", "a8a1"]:
+		move = chess.Move.from_uci(uci)
+		assert decode_book_move(board, encode_book_move(board, move)) == move
+
+
+def test_promotion_encoding_round_trip():
+	board = chess.Board("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+	for uci in ["a7a8q", "a7b8n", "a7a8r", "a7b8b"]:
+		move = chess.Move.from_uci(uci)
+		assert decode_book_move(board, encode_book_move(board, move)) == move
+	antichess = chess.variant.GiveawayBoard("4k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+	assert encode_book_move(antichess, chess.Move.from_uci("a7a8k")) is None
+
+
+def test_book_is_polyglot(tmp_path, monkeypatch):
+	monkeypatch.setattr(opening_book, "BOOK_DIR", str(tmp_path))
+	write_text_book(tmp_path)
+	assert compile_book(tmp_path / "test.book", tmp_path / "test.bin")
+	book = Book("test.bin")
+
+	with chess.polyglot.open_reader(tmp_path / "test.bin") as reader:
+		for board in positions():
+			expected = [(entry.move, entry.weight) for entry in reader.find_all(board)]
+			assert expected
+			assert book.get_moves(board) == expected
+
+
+def test_weights_count_games_across_move_orders(tmp_path, monkeypatch):
+	monkeypatch.setattr(opening_book, "BOOK_DIR", str(tmp_path))
+	write_text_book(tmp_path, lines=["e2e4 e7e5 g1f3 b8c6 f1c4", "g1f3 b8c6 e2e4 e7e5 f1b5"])
+	compile_book(tmp_path / "test.book", tmp_path / "test.bin")
+	board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+	moves = dict(Book("test.bin").get_moves(board))
+	assert moves == {chess.Move.from_uci("f1c4"): 1, chess.Move.from_uci("f1b5"): 1}
+	assert dict(Book("test.bin").get_moves(chess.Board())) == {
+		chess.Move.from_uci("e2e4"): 1, chess.Move.from_uci("g1f3"): 1}
+
+
+def test_snapshots_never_overwrite_other_books(tmp_path, monkeypatch):
+	monkeypatch.setattr(opening_book, "BOOK_DIR", str(tmp_path))
+	write_text_book(tmp_path)
+	(tmp_path / "test.bin").write_bytes(b"builder book")
+
+	class Rules():
+		board = chess.Board
+		books = {chess.WHITE: "test.book", chess.BLACK: "test.bin"}
+
+	variants = {"standard": Rules}
+	assert opening_book.outdated_snapshots(variants) == [("test.book", chess.Board)]
+	opening_book.build_snapshots(variants)
+	assert opening_book.outdated_snapshots(variants) == []
+	assert (tmp_path / "test.bin").read_bytes() == b"builder book"
+	assert Book("test.book").path == str(tmp_path / "test.book.bin")
+	assert Book("test.book").get_moves(chess.Board())
+
+
+def test_load_book_reopens_rebuilt_books(tmp_path, monkeypatch):
+	monkeypatch.setattr(opening_book, "BOOK_DIR", str(tmp_path))
+	monkeypatch.setattr(opening_book, "_books", {})
+	monkeypatch.setattr(opening_book, "_missing", set())
+	assert opening_book.load_book("test.book") is None
+
+	write_text_book(tmp_path, lines=["e2e4 e7e5"])
+	compile_book(tmp_path / "test.book", tmp_path / "test.book.bin")
+	book = opening_book.load_book("test.book")
+	assert dict(book.get_moves(chess.Board())) == {chess.Move.from_uci("e2e4"): 1}
+	assert opening_book.load_book("test.book") is book
+
+	write_text_book(tmp_path, lines=["d2d4 d7d5", "d2d4 g8f6"])
+	compile_book(tmp_path / "test.book", tmp_path / "test.book.bin")
+	os.utime(tmp_path / "test.book.bin", ns=(book.mtime + 10 ** 9, book.mtime + 10 ** 9))
+	rebuilt = opening_book.load_book("test.book")
+	assert rebuilt is not book
+	assert dict(rebuilt.get_moves(chess.Board())) == {chess.Move.from_uci("d2d4"): 2}
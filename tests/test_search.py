@@ -0,0 +1,67 @@
+import chess
+import chess.variant
+
+from engine import Searcher, MATE_SCORE
+
+
+def searcher_at(board, variant="standard"):
+	searcher = Searcher(variant, tt_size_mb=1)
+	searcher.new_search()
+	searcher.reset_search_stacks(board)
+	return searcher
+
+
+def push_null(searcher, board):
+	"""Null move as negamax plays it."""
+	searcher.push_move(board, chess.Move.null())
+	searcher.null_index = len(searcher.hash_stack) - 1
+
+
+def test_repetition():
+	board = chess.Board()
+	searcher = searcher_at(board)
+	for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+		assert not searcher.is_repetition(board)
+		searcher.push_move(board, chess.Move.from_uci(uci))
+	assert searcher.is_repetition(board)
+
+
+def test_repetition_of_game_history():
+	board = chess.Board()
+	for uci in ["g1f3", "g8f6", "f3g1"]:
+		board.push_uci(uci)
+	searcher = searcher_at(board)
+	searcher.push_move(board, chess.Move.from_uci("f6g8"))
+	assert searcher.is_repetition(board)
+
+
+def test_no_repetition_across_null_move():
+	board = chess.Board("7k/8/8/8/8/8/P7/4K3 w - - 0 1")
+	searcher = searcher_at(board)
+	# The white king triangulates, black passes once
+	for uci in ["e1e2", "h8g8", "e2d1", "g8h8", "d1e1"]:
+		searcher.push_move(board, chess.Move.from_uci(uci))
+	push_null(searcher, board)
+	# Same position as the root, but only through the null move
+	assert searcher.hash_stack[-1] == searcher.hash_stack[0]
+	assert not searcher.is_repetition(board)
+	searcher.null_index = 0
+	assert searcher.is_repetition(board)
+
+
+def test_quiescence_stalemate_is_a_draw():
+	board = chess.Board("k7/8/1K6/4Q3/8/8/8/8 b - - 0 1")
+	searcher = searcher_at(board)
+	assert searcher.quiesce(board, -MATE_SCORE, MATE_SCORE, -1) == 0
+
+
+def test_search_avoids_stalemate():
+	board = chess.Board("k7/8/1K6/4r3/8/8/8/4Q3 w - - 0 1")
+	searcher = Searcher(tt_size_mb=1)
+	assert searcher.search(board, 1, 1) != chess.Move.from_uci("e1e5")
+
+
+def test_antichess_stalemate_wins():
+	board = chess.variant.GiveawayBoard("8/8/8/8/8/p7/P7/8 w - - 0 1")
+	searcher = searcher_at(board, "antichess")
+	assert searcher.quiesce(board, -MATE_SCORE, MATE_SCORE, 1) == MATE_SCORE
@@ -0,0 +1,77 @@
+import random
+
+import chess
+import chess.variant
+import pytest
+
+from see import see, atomic_see, SEE_VALUES
+
+
+def exchange(board, square):
+	"""
+	Best balance for the side to move of recapturing on square, played out
+	on the board with its least valuable attacker (pins ignored, like see()).
+	"""
+	captures = list(board.generate_pseudo_legal_captures(to_mask=chess.BB_SQUARES[square]))
+	if not captures:
+		return 0
+	move = min(captures, key=lambda capture: (board.piece_type_at(capture.from_square), capture.from_square))
+	value = SEE_VALUES[board.piece_type_at(square)]
+	board.push(move)
+	balance = max(0, value - exchange(board, square))
+	board.pop()
+	return balance
+
+
+def brute_force_see(board, move):
+	victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+	gain = SEE_VALUES[victim]
+	if move.promotion:
+		gain += SEE_VALUES[move.promotion] - SEE_VALUES[chess.PAWN]
+	board.push(move)
+	gain -= exchange(board, move.to_square)
+	board.pop()
+	return gain
+
+
+def test_see_matches_brute_force():
+	rng = random.Random(1)
+	tested = 0
+	for _ in range(60):
+		board = chess.Board()
+		for _ in range(rng.randint(10, 80)):
+			if board.is_game_over():
+				break
+			board.push(rng.choice(list(board.legal_moves)))
+			for move in board.generate_legal_captures():
+				# Recaptures by pawns on the back rank would promote, see() doesn't model that
+				if chess.BB_SQUARES[move.to_square] & chess.BB_BACKRANKS:
+					continue
+				assert see(board, move) == brute_force_see(board, move), (board.fen(), move.uci())
+				tested += 1
+	assert tested > 1000
+
+
+@pytest.mark.parametrize("fen, uci, expected", [
+	# Undefended pawn
+	("4k3/8/8/3p4/8/8/8/3RK3 w - - 0 1", "d1d5", 100),
+	# Defended pawn: rook for a pawn
+	("4k3/8/4p3/3p4/8/8/8/3RK3 w - - 0 1", "d1d5", -400),
+	# Rook x-rayed by the queen behind it wins the pawn
+	("4k3/3r4/8/3p4/8/8/3R4/3QK3 w - - 0 1", "d2d5", 100),
+	# En passant
+	("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 100),
+	# Capture-promotion
+	("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8q", 1300),
+])
+def test_see_positions(fen, uci, expected):
+	board = chess.Board(fen)
+	move = chess.Move.from_uci(uci)
+	assert see(board, move) == expected == brute_force_see(board, move)
+
+
+def test_atomic_see_explosion():
+	# Nxd5 blows up the knight, the pawn and the queen and rook next to it, not the pawn on e4
+	board = chess.variant.AtomicBoard("4k3/8/2q1r3/3p4/4P3/2N5/8/4K3 w - - 0 1")
+	expected = SEE_VALUES[chess.PAWN] - SEE_VALUES[chess.KNIGHT] + SEE_VALUES[chess.QUEEN] + SEE_VALUES[chess.ROOK]
+	assert atomic_see(board, chess.Move.from_uci("c3d5")) == expected
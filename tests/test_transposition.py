@@ -0,0 +1,82 @@
+import chess
+
+from transposition import TranspositionTable, EXACT, LOWERBOUND, UPPERBOUND, encode_move, decode_move
+
+
+def bucket_keys(table, count, bucket=5):
+	"""count different keys that all map to the same bucket."""
+	return [bucket + n * (table.mask + 1) + (n << 40) for n in range(count)]
+
+
+def test_move_encoding_round_trip():
+	for uci in ['e2e4', 'e1g1', 'a7a8q', 'b2a1n', 'h7h8r']:
+		move = chess.Move.from_uci(uci)
+		assert decode_move(encode_move(move)) == move
+	assert encode_move(None) == 0
+	assert decode_move(0) is None
+
+
+def test_store_probe_round_trip():
+	table = TranspositionTable(1)
+	entries = [
+		(0x0123456789ABCDEF, 7, 35, EXACT, chess.Move.from_uci('g1f3')),
+		(0xFEDCBA9876543210, -3, -420, LOWERBOUND, chess.Move.from_uci('a7a8q')),
+		(0x00000000DEADBEEF, 0, 9999990, UPPERBOUND, None),
+	]
+	for key, depth, score, flag, move in entries:
+		table.store(key, depth, score, flag, move)
+	for key, depth, score, flag, move in entries:
+		assert table.probe(key) == (depth, score, flag, move)
+	assert table.probe(0x1111) is None
+
+
+def test_shared_buffer():
+	buffer = bytearray(TranspositionTable.buffer_size(1))
+	writer = TranspositionTable(1, buffer=buffer)
+	reader = TranspositionTable(1, buffer=buffer)
+	writer.store(42, 3, 17, EXACT, chess.Move.from_uci('e2e4'))
+	assert reader.probe(42) == (3, 17, EXACT, chess.Move.from_uci('e2e4'))
+
+
+def test_store_keeps_best_move():
+	table = TranspositionTable(1)
+	move = chess.Move.from_uci('d2d4')
+	table.store(99, 4, 10, LOWERBOUND, move)
+	table.store(99, 5, 12, UPPERBOUND, None)
+	assert table.probe(99) == (5, 12, UPPERBOUND, move)
+
+
+def test_bucket_replacement():
+	table = TranspositionTable(0.01)
+	a, b, c, d, e = bucket_keys(table, 5)
+
+	# Deep entry in the depth-preferred slot, shallower one in the other
+	table.store(a, 6, 1, EXACT, None)
+	table.store(b, 3, 2, EXACT, None)
+	assert table.probe(a)[1] == 1
+	assert table.probe(b)[1] == 2
+
+	# A shallower entry replaces the always-replace slot only
+	table.store(c, 2, 3, EXACT, None)
+	assert table.probe(a)[1] == 1
+	assert table.probe(b) is None
+	assert table.probe(c)[1] == 3
+
+	# Same or deeper takes the depth-preferred slot
+	table.store(d, 6, 4, EXACT, None)
+	assert table.probe(a) is None
+	assert table.probe(d)[1] == 4
+
+	# Entries of an older search are replaced whatever their depth
+	table.new_search()
+	table.store(e, 1, 5, EXACT, None)
+	assert table.probe(d) is None
+	assert table.probe(e)[1] == 5
+
+
+def test_clear():
+	table = TranspositionTable(0.01)
+	table.store(7, 1, 1, EXACT, None)
+	table.clear()
+	assert table.probe(7) is None
+	assert table.hashfull() == 0
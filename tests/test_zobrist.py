@@ -0,0 +1,77 @@
+import random
+
+import chess
+import chess.polyglot
+import chess.variant
+import pytest
+
+import zobrist
+from engine import Searcher
+
+BOARDS = [chess.Board, chess.variant.AtomicBoard, chess.variant.GiveawayBoard, chess.variant.ThreeCheckBoard]
+
+
+def random_game(board_class, rng, plies=80):
+	"""Board of a random game, yielded after every move with the snapshot before it."""
+	board = board_class()
+	for _ in range(plies):
+		if board.is_game_over():
+			break
+		before = zobrist.snapshot(board)
+		board.push(rng.choice(list(board.legal_moves)))
+		yield before, board
+
+
+def polyglot_part(board):
+	"""hash_board() without the variant salt and remaining checks."""
+	h = zobrist.hash_board(board) ^ zobrist.VARIANT_KEYS.get(board.uci_variant, 0)
+	if board.uci_variant == "3check":
+		h ^= zobrist._checks_key(board)
+	return h
+
+
+@pytest.mark.parametrize("board_class", BOARDS)
+def test_incremental_hash(board_class):
+	rng = random.Random(1)
+	for _ in range(20):
+		h = zobrist.hash_board(board_class())
+		pawns = zobrist.pawn_hash(board_class())
+		for before, board in random_game(board_class, rng):
+			changes = zobrist.piece_changes(before, board)
+			h = zobrist.update_hash(h, before, board, changes)
+			pawns = zobrist.update_pawn_hash(pawns, changes)
+			assert h == zobrist.hash_board(board)
+			assert pawns == zobrist.pawn_hash(board)
+			assert polyglot_part(board) == chess.polyglot.zobrist_hash(board)
+
+
+def test_standard_hash_is_polyglot():
+	rng = random.Random(3)
+	for _ in range(5):
+		for _, board in random_game(chess.Board, rng):
+			assert zobrist.hash_board(board) == chess.polyglot.zobrist_hash(board)
+
+
+def test_variants_hash_apart():
+	keys = {zobrist.hash_board(board_class()) for board_class in BOARDS}
+	assert len(keys) == len(BOARDS)
+
+
+@pytest.mark.parametrize("variant, board_class", [("standard", chess.Board), ("atomic", chess.variant.AtomicBoard),
+												  ("antichess", chess.variant.GiveawayBoard),
+												  ("threeCheck", chess.variant.ThreeCheckBoard)])
+def test_searcher_hash_stack(variant, board_class):
+	searcher = Searcher(variant, tt_size_mb=1)
+	rng = random.Random(2)
+	board = board_class()
+	searcher.reset_search_stacks(board)
+	pushed = 0
+	for _ in range(60):
+		if board.is_game_over():
+			break
+		searcher.push_move(board, rng.choice(list(board.legal_moves)))
+		pushed += 1
+		assert searcher.hash_stack[-1] == zobrist.hash_board(board)
+	for _ in range(pushed):
+		searcher.pop_move(board)
+		assert searcher.hash_stack[-1] == zobrist.hash_board(board)
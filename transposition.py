@@ -0,0 +1,164 @@
+import chess
+
+# Transposition table entry types
+EXACT = 0      # Exact score
+LOWERBOUND = 1 # Score is at least this (beta cutoff)
+UPPERBOUND = 2 # Score is at most this (failed to raise alpha)
+
+# Every entry is two 64-bit words: (key ^ data, data).
+# Storing the key XORed with the data means a torn write can never be
+# mistaken for a valid entry, the verification simply fails.
+#
+# data layout:
+#   bits  0-15  move (from 6 | to 6 | promotion 3)
+#   bits 16-23  depth + 128 (quiescence entries use negative depths)
+#   bits 24-25  bound (EXACT / LOWERBOUND / UPPERBOUND)
+#   bits 26-31  generation
+#   bits 32-63  score + 2^31
+ENTRY_BYTES = 16
+SLOTS_PER_BUCKET = 2  # slot 0: depth-preferred, slot 1: always-replace
+BUCKET_BYTES = ENTRY_BYTES * SLOTS_PER_BUCKET
+
+DEPTH_OFFSET = 128
+SCORE_OFFSET = 1 << 31
+SCORE_MAX = (1 << 31) - 1
+GENERATION_MASK = 0x3F
+
+def encode_move(move):
+	"""Encode a move into 16 bits (0 means no move)."""
+	if not move:
+		return 0
+	return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code):
+	"""Decode a 16-bit move, returns None for the empty move."""
+	if not code:
+		return None
+	promotion = (code >> 12) & 0x7
+	return chess.Move(code & 0x3F, (code >> 6) & 0x3F, promotion or None)
+
+
+def _encode_score(score):
+	# Scores are finite (mates are MATE_SCORE - ply in engine.py), clamp just in case
+	return max(-SCORE_MAX, min(SCORE_MAX, int(round(score)))) + SCORE_OFFSET
+
+
+def _decode_score(raw):
+	return raw - SCORE_OFFSET
+
+
+class TranspositionTable():
+	"""
+	Transposition table living in one preallocated flat buffer.
+
+	The table is split into buckets of two entries. The first entry of a
+	bucket keeps the deepest search of the current generation, the second
+	one is always overwritten. Memory use is fixed by size_mb and never
+	grows during the game.
+
+	The buffer can be supplied by the caller (e.g. the buf of a
+	multiprocessing.shared_memory.SharedMemory) so several processes
+	can share one table. Entries are verified with key ^ data, so
+	concurrent writers need no locking.
+	"""
+
+	def __init__(self, size_mb=32, buffer=None):
+		self.resize(size_mb, buffer)
+
+	@staticmethod
+	def buffer_size(size_mb):
+		"""Bytes of buffer used by a table of size_mb megabytes."""
+		buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_BYTES)
+		# Round down to a power of two so the index is a simple mask
+		return (1 << (buckets.bit_length() - 1)) * BUCKET_BYTES
+
+	def resize(self, size_mb, buffer=None):
+		"""Reallocate the table to (at most) size_mb megabytes and clear it."""
+		size = self.buffer_size(size_mb)
+		if buffer is None:
+			buffer = bytearray(size)
+		self.size_mb = size_mb
+		self.mask = size // BUCKET_BYTES - 1
+		self.generation = 0
+		self.raw = memoryview(buffer)[:size]
+		self.table = self.raw.cast('Q')
+
+	def clear(self):
+		"""Wipe all entries."""
+		self.raw[:] = bytes(len(self.raw))
+		self.generation = 0
+
+	def release(self):
+		"""Drop the views on the buffer (needed before closing shared memory)."""
+		self.table.release()
+		self.raw.release()
+
+	def new_search(self):
+		"""Age the table, entries from older searches become replaceable."""
+		self.generation = (self.generation + 1) & GENERATION_MASK
+
+	def probe(self, key):
+		"""
+		Look up a position.
+
+		Returns:
+			(depth, score, flag, move) or None if the position is not stored
+		"""
+		table = self.table
+		i = (key & self.mask) << 2
+
+		data = table[i + 1]
+		if not data or table[i] ^ data != key:
+			data = table[i + 3]
+			if not data or table[i + 2] ^ data != key:
+				return None
+
+		return (((data >> 16) & 0xFF) - DEPTH_OFFSET,
+				_decode_score(data >> 32),
+				(data >> 24) & 0x3,
+				decode_move(data & 0xFFFF))
+
+	def store(self, key, depth, score, flag, move):
+		"""Store a search result, using depth-preferred + always-replace buckets."""
+		table = self.table
+		i = (key & self.mask) << 2
+		move_code = encode_move(move)
+
+		old = table[i + 1]
+		same_key = old and table[i] ^ old == key
+		if (not old or same_key or
+			depth >= ((old >> 16) & 0xFF) - DEPTH_OFFSET or
+			(old >> 26) & GENERATION_MASK != self.generation):
+			slot = i
+		else:
+			slot = i + 2
+			old = table[i + 3]
+			same_key = old and table[i + 2] ^ old == key
+
+		# Keep the known best move if this result doesn't bring one
+		if not move_code and same_key:
+			move_code = old & 0xFFFF
+
+		data = (move_code |
+				((depth + DEPTH_OFFSET) & 0xFF) << 16 |
+				flag << 24 |
+				self.generation << 26 |
+				_encode_score(score) << 32)
+		table[slot] = key ^ data
+		table[slot + 1] = data
+
+	def hashfull(self):
+		"""Permille of sampled entries written during the current search (like UCI hashfull)."""
+		table = self.table
+		samples = min(1000, len(table) // 2)
+		used = 0
+		for n in range(samples):
+			data = table[2 * n + 1]
+			if data and (data >> 26) & GENERATION_MASK == self.generation:
+				used += 1
+		return used * 1000 // samples
+
+	def __len__(self):
+		"""Number of entry slots in the table."""
+		return len(self.table) // 2
@@ -0,0 +1,183 @@
+"""
+Variant-aware Zobrist hashing, maintained incrementally on push/pop.
+
+For standard chess the key equals chess.polyglot.zobrist_hash, so it can be
+used to probe Polyglot books. Variant state the Polyglot hash ignores is
+folded in on top: a per-variant salt and, for three-check, the number of
+remaining checks of each side. Atomic explosions are ordinary piece
+removals and are picked up by diffing the bitboards around the move.
+"""
+import random
+import chess
+import chess.polyglot
+
+_RANDOM = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+
+# PIECE_KEYS[color][piece_type][square]
+PIECE_KEYS = [[[0] * 64 for _ in range(7)] for _ in range(2)]
+for _color in chess.COLORS:
+	for _piece_type in chess.PIECE_TYPES:
+		for _square in chess.SQUARES:
+			PIECE_KEYS[_color][_piece_type][_square] = _RANDOM[64 * ((_piece_type - 1) * 2 + _color) + _square]
+
+TURN_KEY = _RANDOM[780]
+EP_KEYS = tuple(_RANDOM[772 + f] for f in range(8))
+
+# Castling keys indexed by the corner bits of board.castling_rights:
+# bit 0 = h1, bit 1 = a1, bit 2 = h8, bit 3 = a8 (Polyglot order K, Q, k, q)
+CASTLING_KEYS = []
+for _rights in range(16):
+	_key = 0
+	for _bit in range(4):
+		if _rights & (1 << _bit):
+			_key ^= _RANDOM[768 + _bit]
+	CASTLING_KEYS.append(_key)
+CASTLING_KEYS = tuple(CASTLING_KEYS)
+
+# Extra keys for variant state, fixed seed so keys are stable across processes
+_rng = random.Random(0xB0771051)
+VARIANT_KEYS = {
+	"chess": 0,
+	"atomic": _rng.getrandbits(64),
+	"giveaway": _rng.getrandbits(64),
+	"antichess": _rng.getrandbits(64),
+	"suicide": _rng.getrandbits(64),
+	"3check": _rng.getrandbits(64),
+}
+# CHECK_KEYS[color][remaining_checks]
+CHECK_KEYS = tuple(tuple(_rng.getrandbits(64) for _ in range(4)) for _ in chess.COLORS)
+
+
+def _castling_index(castling_rights):
+	return (bool(castling_rights & chess.BB_H1) |
+			bool(castling_rights & chess.BB_A1) << 1 |
+			bool(castling_rights & chess.BB_H8) << 2 |
+			bool(castling_rights & chess.BB_A8) << 3)
+
+
+def _ep_key(board):
+	"""En passant file key, only if a pawn is ready to capture (as Polyglot)."""
+	ep_square = board.ep_square
+	if not ep_square:
+		return 0
+	turn = board.turn
+	if chess.BB_PAWN_ATTACKS[not turn][ep_square] & board.pawns & board.occupied_co[turn]:
+		return EP_KEYS[ep_square & 7]
+	return 0
+
+
+def _checks_key(board):
+	remaining = board.remaining_checks
+	return (CHECK_KEYS[chess.WHITE][max(remaining[chess.WHITE], 0)] ^
+			CHECK_KEYS[chess.BLACK][max(remaining[chess.BLACK], 0)])
+
+
+def hash_board(board):
+	"""Compute the full hash of a position from scratch."""
+	h = VARIANT_KEYS.get(board.uci_variant, 0)
+
+	for color in chess.COLORS:
+		keys = PIECE_KEYS[color]
+		for square in chess.scan_forward(board.occupied_co[color]):
+			h ^= keys[board.piece_type_at(square)][square]
+
+	h ^= CASTLING_KEYS[_castling_index(board.castling_rights)]
+	h ^= _ep_key(board)
+	if board.turn == chess.WHITE:
+		h ^= TURN_KEY
+	if board.uci_variant == "3check":
+		h ^= _checks_key(board)
+	return h
+
+
+def pawn_hash(board):
+	"""Hash of the pawns alone, the key of the pawn hash table."""
+	h = 0
+	pawn_keys = (PIECE_KEYS[chess.BLACK][chess.PAWN], PIECE_KEYS[chess.WHITE][chess.PAWN])
+	for color in chess.COLORS:
+		keys = pawn_keys[color]
+		for square in chess.scan_forward(board.pawns & board.occupied_co[color]):
+			h ^= keys[square]
+	return h
+
+
+def snapshot(board):
+	"""Capture the state needed to update the hash after board.push()."""
+	return (board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE],
+			board.pawns, board.knights, board.bishops,
+			board.rooks, board.queens, board.kings,
+			board.castling_rights, _ep_key(board),
+			tuple(board.remaining_checks) if board.uci_variant == "3check" else None)
+
+
+def _piece_type_in(before, mask):
+	if before[2] & mask:
+		return chess.PAWN
+	if before[3] & mask:
+		return chess.KNIGHT
+	if before[4] & mask:
+		return chess.BISHOP
+	if before[5] & mask:
+		return chess.ROOK
+	if before[6] & mask:
+		return chess.QUEEN
+	return chess.KING
+
+
+def piece_changes(before, board):
+	"""
+	Pieces removed and added by the last push, as (color, piece_type, square, sign)
+	with sign -1 for a removed piece and +1 for an added one.
+
+	Works from occupancy differences, so castling, en passant, promotions
+	and atomic explosions need no special handling.
+	"""
+	changes = []
+	for color in chess.COLORS:
+		old = before[color]
+		new = board.occupied_co[color]
+		if old == new:
+			continue
+		removed = old & ~new
+		added = new & ~old
+		while removed:
+			mask = removed & -removed
+			changes.append((color, _piece_type_in(before, mask), mask.bit_length() - 1, -1))
+			removed ^= mask
+		while added:
+			mask = added & -added
+			square = mask.bit_length() - 1
+			changes.append((color, board.piece_type_at(square), square, 1))
+			added ^= mask
+	return changes
+
+
+def update_hash(h, before, board, changes):
+	"""Hash after board.push(), from the hash and snapshot before the push."""
+	for color, piece_type, square, _ in changes:
+		h ^= PIECE_KEYS[color][piece_type][square]
+
+	h ^= TURN_KEY
+
+	if before[8] != board.castling_rights:
+		h ^= (CASTLING_KEYS[_castling_index(before[8])] ^
+			  CASTLING_KEYS[_castling_index(board.castling_rights)])
+
+	h ^= before[9] ^ _ep_key(board)
+
+	checks = before[10]
+	if checks is not None:
+		remaining = board.remaining_checks
+		for color in chess.COLORS:
+			if checks[color] != remaining[color]:
+				h ^= (CHECK_KEYS[color][max(checks[color], 0)] ^
+					  CHECK_KEYS[color][max(remaining[color], 0)])
+	return h
+
+
+def update_pawn_hash(h, changes):
+	"""Pawn hash after board.push(), from the pawn hash before and piece_changes()."""
+	for color, piece_type, square, _ in changes:
+		if piece_type == chess.PAWN:
+			h ^= PIECE_KEYS[color][chess.PAWN][square]
+	return h